@@ -41,5 +41,4 @@ for f_path in in_dir.glob("*.*"):
 
 # Kick off evaluate using the top-level file
 with open(output, "w") as fh:
-    for line in pro.evaluate(top.parts[-1]):
-        fh.write(line + "\n")
+    fh.writelines(f"{line}\n" for line in pro.evaluate(top.parts[-1]))
@@ -13,17 +13,29 @@
 # limitations under the License.
 
 import re
+import sys
+from string import whitespace
 
 from .common import PrologueError, Line
 from .context import Context
 from .directives import register_prime_directives
 from .directives.base import Directive
-from .directives.common import DirectiveWrap
+from .directives.common import DirectiveWrap, TagRole
 from .registry import Registry
 
 class Prologue(object):
     """ Top-level of the preprocessor """
 
+    # NOTE: Frequently accessed attributes are held in slots, '__dict__' is kept
+    #       so that arbitrary attributes can still be attached to an instance
+    __slots__ = (
+        "__comment", "__delimiter", "__shared_delimiter", "__re_tag",
+        "__re_floating", "implicit_sub", "explicit_style", "allow_redefine",
+        "callback_debug", "callback_info", "callback_warning", "callback_error",
+        "registry", "directives", "__dispatch", "__listed", "__dict__",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         comment         ="#",
@@ -33,6 +45,7 @@ class Prologue(object):
         explicit_style  =("$(", ")"),
         allow_redefine  =False,
         register_prime  =True,
+        prefetch        =False,
     ):
         """ Initialise the preprocessor.
 
@@ -49,6 +62,11 @@ class Prologue(object):
             allow_redefine  : Allow values to be defined multiple times (by
                               default raises a PrologueError, default: False)
             register_prime  : Register the prime directives (default: True)
+            prefetch        : Read files added to the registry in the background,
+                              call 'close' to stop the worker threads once done.
+                              Every file added is held in memory until first
+                              used, even if it is never imported or included
+                              (default: False)
         """
         # Sanity checks
         if not isinstance(comment, str):
@@ -65,7 +83,11 @@ class Prologue(object):
             raise PrologueError(f"Allow redefinition must be True or False: {allow_redefine}")
         if register_prime not in (True, False):
             raise PrologueError(f"Register prime must be True or False: {register_prime}")
+        if prefetch not in (True, False):
+            raise PrologueError(f"Prefetch must be True or False: {prefetch}")
         # Store attributes
+        self.__comment        = None
+        self.__delimiter      = None
         self.comment          = comment
         self.delimiter        = delimiter
         self.shared_delimiter = shared_delimiter
@@ -78,15 +100,28 @@ class Prologue(object):
         self.callback_warning = None
         self.callback_error   = None
         # Create a registry instance
-        self.registry = Registry(self)
-        # Create a store for directives
+        self.registry = Registry(self, prefetch=prefetch)
+        # Create a store for directives, and a lookup from each tag to the
+        # directive and the role the tag plays
         self.directives = {}
+        self.__dispatch = {}
+        self.__listed   = None
         if register_prime: register_prime_directives(self)
 
     # ==========================================================================
     # Property Setters/Getters
     # ==========================================================================
 
+    @property
+    def comment(self): return self.__comment
+
+    @comment.setter
+    def comment(self, val):
+        # Set comment
+        self.__comment = val
+        # Rebuild the directive patterns
+        self.__build_patterns()
+
     @property
     def delimiter(self): return self.__delimiter
 
@@ -95,10 +130,12 @@ class Prologue(object):
         # Check delimiter
         if len(val.strip()) == 0:
             raise PrologueError("Delimiter should be at least one character")
-        elif len(val.replace(" ", "")) != len(val):
+        elif any(x.isspace() for x in val):
             raise PrologueError("Delimiter should not contain whitespace")
         # Set delimiter
         self.__delimiter = val
+        # Rebuild the directive patterns
+        self.__build_patterns()
 
     @property
     def shared_delimiter(self): return self.__shared_delimiter
@@ -111,6 +148,42 @@ class Prologue(object):
         # Set value
         self.__shared_delimiter = val
 
+    def __build_patterns(self):
+        """
+        Compile the regular expressions used to recognise anchored and floating
+        directives. These only depend on the comment and delimiter sequences,
+        so are rebuilt whenever either changes rather than on every evaluation.
+        """
+        # Wait until both the comment and delimiter have been set
+        if self.__comment is None or self.__delimiter is None: return
+        comment, delimiter = self.__comment, self.__delimiter
+        # NOTE: The delimiter is escaped so that multi-character sequences are
+        #       matched literally, rather than as a character class
+        delimiter = re.escape(delimiter)
+        # NOTE: A single character comment can be excluded with a character
+        #       class, but a longer sequence needs a lookahead so that text
+        #       containing only part of the sequence is still accepted
+        if len(comment) == 1:
+            not_cmt = r"[^" + re.escape(comment) + r"]*"
+        else:
+            not_cmt = r"(?:(?!" + re.escape(comment) + r").)*"
+        # Anchored directives are found without an expression, as only leading
+        # whitespace can precede the delimiter, so this expression just splits
+        # the tag and arguments that follow the delimiter
+        # NOTE: Both cases are listed for the tag rather than matching with
+        #       IGNORECASE, the tag is lowercased once it has been captured.
+        #       Expressions are compiled as ASCII, as tags can only contain ASCII
+        #       characters.
+        # NOTE: The arguments are captured greedily rather than with a lazy
+        #       group ahead of '$', which would test for the end of the line
+        #       after every character consumed
+        self.__re_tag = re.compile(r"([A-Za-z0-9_]+)(.*)", flags=re.ASCII)
+        # Floating expression, used if a line doesn't hold a known anchored tag
+        self.__re_floating = re.compile(
+            r"^(" + not_cmt + r")" + delimiter + r"([A-Za-z0-9_]+)(.*)",
+            flags=re.ASCII,
+        )
+
     # ==========================================================================
     # Message Handlers
     # ==========================================================================
@@ -206,6 +279,16 @@ class Prologue(object):
             ignore_duplicate=ignore_duplicate,
         )
 
+    def close(self):
+        """ Release resources held by the registry, such as prefetch workers """
+        self.registry.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     # ==========================================================================
     # Directives
     # ==========================================================================
@@ -219,13 +302,22 @@ class Prologue(object):
         # Check that the directive is correctly decorated
         if not isinstance(dirx, DirectiveWrap):
             raise PrologueError("Directive type is not known, is it decorated?")
-        # Check all tags
-        for tag in dirx.tags:
-            # Check if the tag collides with an existing directive
-            if tag.lower() in self.directives:
-                raise PrologueError(f"Directive already registered for tag '{tag}'")
+        # Check if any tag collides with an existing directive
+        # NOTE: DirectiveWrap has already lowercased the tags, so they can be
+        #       compared with the registered tags directly
+        tags = dirx.tags
+        if not self.directives.keys().isdisjoint(tags):
+            clash = next(x for x in tags if x in self.directives)
+            raise PrologueError(f"Directive already registered for tag '{clash}'")
         # Register the directive
-        for tag in dirx.tags: self.directives[tag.lower()] = dirx
+        # NOTE: Tags are interned so that lookups of the (also interned) tags
+        #       captured during evaluation can compare by identity
+        for tag in tags:
+            tag = sys.intern(tag)
+            self.directives[tag] = dirx
+            self.__dispatch[tag] = (dirx, dirx.role(tag))
+        # Invalidate the list of unique directives
+        self.__listed = None
 
     def deregister_directive(self, tag):
         """ Remove a previously registered directive.
@@ -233,16 +325,23 @@ class Prologue(object):
         Args:
             tag: The tag of the directive
         """
-        if tag.lower() not in self.directives:
+        dirx = self.directives.get(tag.lower(), None)
+        if not dirx:
             raise PrologueError(f"No directive registered for tag '{tag}'")
-        for dirx_tag in self.directives[tag.lower()].tags:
+        for dirx_tag in dirx.tags:
             del self.directives[dirx_tag]
+            del self.__dispatch[dirx_tag]
+        # Invalidate the list of unique directives
+        self.__listed = None
 
     def list_directives(self):
         """ Return all of the registered directives.
 
         Returns: A list of directives """
-        return list(set(self.directives.values()))
+        # Build the unique set of directives only when they have changed
+        if self.__listed is None:
+            self.__listed = tuple(set(self.directives.values()))
+        return list(self.__listed)
 
     def has_directive(self, tag):
         """ Test if a directive has been registered for a given tag.
@@ -265,14 +364,29 @@ class Prologue(object):
 
         Returns: Directive function if known, otherwise None
         """
-        # Check if a directive exists for this tag
-        if tag.lower() not in self.directives:
-            if self.shared_delimiter:
-                return None
-            else:
-                raise PrologueError(f"No directive known for tag '{tag}'")
+        # Lookup the directive, checking if one exists for this tag
+        dirx = self.directives.get(tag.lower(), None)
+        if not dirx and not self.shared_delimiter:
+            raise PrologueError(f"No directive known for tag '{tag}'")
         # Return the directive
-        return self.directives[tag.lower()]
+        return dirx
+
+    def __lookup_directive(self, tag):
+        """
+        Return the directive and the role of a particular tag, following the
+        same rules as 'get_directive' for unknown tags.
+
+        Args:
+            tag: The lowercase tag of the directive
+
+        Returns: Tuple of directive and TagRole if known, otherwise (None, None)
+        """
+        # NOTE: Tags are already lowercase, so the directive store doesn't need
+        #       to be consulted through 'get_directive'
+        entry = self.__dispatch.get(tag, None)
+        if entry: return entry
+        if self.shared_delimiter: return None, None
+        raise PrologueError(f"No directive known for tag '{tag}'")
 
     # ==========================================================================
     # Evaluation
@@ -304,10 +418,18 @@ class Prologue(object):
             initial_state =defines,
         )
         # Use inner evaluation routine to get each line one at a time
-        for line in self.evaluate_inner(filename, context, callback=callback):
-            final = context.substitute(line)
-            if isinstance(lookup, list): lookup.append((final.file, final.number))
-            yield str(final)
+        # NOTE: The loop is chosen once depending on whether a lookup is being
+        #       captured, rather than testing the lookup for every line. The
+        #       substitution returns a plain string and records the source of
+        #       each line straight into the lookup.
+        substitute = context.substitute_into
+        if isinstance(lookup, list):
+            lookup_append = lookup.append
+            for line in self.evaluate_inner(filename, context, callback=callback):
+                yield substitute(line, lookup_append)
+        else:
+            for line in self.evaluate_inner(filename, context, callback=callback):
+                yield substitute(line)
         # Get all files included as part of the trace
         if isinstance(included, list): included += list(set(context.trace))
 
@@ -328,102 +450,156 @@ class Prologue(object):
         r_file = self.registry.resolve(filename)
         if not r_file: raise PrologueError(f"Failed to find file {filename}")
         # Sanity check a context object was provided
-        if not isinstance(context, Context):
+        # NOTE: Recursive calls always pass along the same context, so the check
+        #       is only made when running without optimisation ('python -O')
+        if __debug__ and not isinstance(context, Context):
             raise PrologueError(f"An invalid context was provided: {context}")
         # Stop infinite recursion by checking if this file is already in the stack
-        if r_file in context.stack:
+        if context.stack_contains(r_file):
             raise PrologueError(
                 f"Detected infinite recursion when including file '{filename}' "
                 f"- file stack: {', '.join([x.filename for x in context.stack])}"
             )
-        # Create regular expressions for recognising directives
-        re_anchored = re.compile(
-            r"^[\s]*[" + self.delimiter + r"]([a-z0-9_]+)(.*?)$", flags=re.IGNORECASE,
-        )
-        re_floating = re.compile(
-            r"^([^" + self.comment + "]*)[" + self.delimiter + r"]([a-z0-9_]+)(.*?)$", flags=re.IGNORECASE,
-        )
+        # Pickup the precompiled regular expressions for recognising directives,
+        # and hoist other attribute lookups out of the per-line loop
+        re_tag        = self.__re_tag.match
+        re_floating   = self.__re_floating.match
+        delimiter     = self.__delimiter
+        len_delim     = len(delimiter)
+        comment       = self.__comment
+        strip_comment = (comment != delimiter)
+        lookup_dirx   = self.__lookup_directive
+        intern        = sys.intern
+        # Hoist the tag roles into locals, so that each directive line is
+        # dispatched with plain integer comparisons
+        role_line       = TagRole.LINE
+        role_opening    = TagRole.OPENING
+        role_transition = TagRole.TRANSITION
+        role_closing    = TagRole.CLOSING
         # Push the current file into the stack
         context.stack_push(r_file)
+        # Files already found to contain no directives, comments, or line
+        # continuations during this evaluation can be passed straight through
+        plain = context.plain
+        if r_file in plain:
+            yield from r_file.contents
+            if context.stack_pop() != r_file:
+                raise PrologueError("File stack has been corrupted")
+            return
         # Start parsing
+        # NOTE: The type of the active block is tracked alongside it, so that it
+        #       only needs to be determined when the active block changes
         active      = None
-        accumulated = None
+        active_type = None
+        accumulated = []
+        is_plain    = True
         for idx, line in enumerate(r_file.contents):
+            # If comment and delimiter are different, remove everything after comment
+            # NOTE: Only the first occurrence matters, so the line is sliced
+            #       rather than split at every occurrence
+            if strip_comment:
+                cmt_idx = line.find(comment)
+                if cmt_idx >= 0:
+                    line     = line[:cmt_idx]
+                    is_plain = False
+            # Handle line continuation
+            # NOTE: Sections are collected in a single reused list and
+            #       joined once the final line is reached, avoiding
+            #       repeated concatenation
+            if line.endswith("\\"):
+                is_plain = False
+                accumulated.append(line[:-1])
+                continue
+            elif accumulated:
+                # The first section carries the file and line number
+                accumulated.append(line)
+                line = accumulated[0] + "".join(accumulated[1:])
+                accumulated.clear()
+            # Lines without the delimiter can't contain a directive, so pass
+            # them straight through without running either expression
+            if delimiter not in line:
+                if active: active.append(line)
+                else     : yield line
+                continue
             # Catch any exceptions so that they can be marked with file and line
+            # NOTE: Only lines that may hold a directive enter the handler, the
+            #       steps above only manipulate the line's text
             try:
-                # If comment and delimiter are different, remove everything after comment
-                if self.comment != self.delimiter:
-                    line = line.split(self.comment)[0]
-                # Handle line continuation
-                if line and line[-1] == "\\":
-                    accumulated = (accumulated + line[:-1]) if accumulated else line[:-1]
-                    continue
-                elif accumulated:
-                    line        = accumulated + line
-                    accumulated = None
-                # Test if the line matches an anchored directive
-                anchored = re_anchored.match(line)
+                # Test if the line holds an anchored directive, only whitespace
+                # may precede the delimiter so the tag and arguments can be
+                # matched directly after it
+                # NOTE: Only ASCII whitespace is stripped, matching the ASCII
+                #       compiled floating expression
+                is_plain = False
+                anchored = None
+                stripped = line.lstrip(whitespace)
+                if stripped.startswith(delimiter):
+                    anchored = re_tag(stripped, len_delim)
                 if anchored:
                     tag, arguments = anchored.groups()
                     arguments      = arguments.strip()
-                    tag            = tag.lower()
-                    d_wrap         = self.get_directive(tag)
-                    if arguments.endswith(":"): arguments = arguments[:-1]
-                    if d_wrap and d_wrap.is_line:
+                    tag            = intern(tag.lower())
+                    d_wrap, role   = lookup_dirx(tag)
+                    if arguments.endswith(":"): arguments = arguments[:-1].rstrip()
+                    if role == role_line:
                         l_dir = d_wrap.directive(
                             active, src_file=r_file, src_line=(idx + 1),
                             callback=callback,
                         )
-                        l_dir.invoke(tag, arguments.strip())
+                        l_dir.invoke(tag, arguments)
                         if   active      : active.append(l_dir)
                         elif l_dir.yields: yield from l_dir.evaluate(context)
                         else             : l_dir.evaluate(context)
                         # Move on to the next line
                         continue
-                    elif d_wrap and d_wrap.is_block:
-                        # Call the directive
-                        if d_wrap.is_opening(tag):
-                            block   = d_wrap.directive(
-                                active, src_file=r_file, src_line=(idx + 1),
-                                callback=callback,
-                            )
-                            block.open(tag, arguments)
-                            # If a block is already open, append to it
-                            if active: active.append(block)
-                            # Track currently active block
-                            active = block
-                        elif d_wrap.is_transition(tag):
-                            if d_wrap.directive != type(active):
-                                raise PrologueError(f"Transition tag '{tag}' was not expected")
-                            active.transition(tag, arguments)
-                        elif d_wrap.is_closing(tag):
-                            if d_wrap.directive != type(active):
-                                raise PrologueError(f"Closing tag '{tag}' was not expected")
-                            active.close(tag, arguments)
-                            # If there is no parent, this is the root
-                            if not active.parent:
-                                if active.yields:
-                                    yield from active.evaluate(context.fork())
-                                else:
-                                    active.evaluate(context.fork())
-                            # Pop the stack
-                            active = active.parent
+                    elif role == role_opening:
+                        block = d_wrap.directive(
+                            active, src_file=r_file, src_line=(idx + 1),
+                            callback=callback,
+                        )
+                        block.open(tag, arguments)
+                        # If a block is already open, append to it
+                        if active: active.append(block)
+                        # Track currently active block
+                        active      = block
+                        active_type = d_wrap.directive
+                        # Move on to the next line
+                        continue
+                    elif role == role_transition:
+                        if d_wrap.directive is not active_type:
+                            raise PrologueError(f"Transition tag '{tag}' was not expected")
+                        active.transition(tag, arguments)
+                        # Move on to the next line
+                        continue
+                    elif role == role_closing:
+                        if d_wrap.directive is not active_type:
+                            raise PrologueError(f"Closing tag '{tag}' was not expected")
+                        active.close(tag, arguments)
+                        # If there is no parent, this is the root
+                        if not active.parent:
+                            if active.yields:
+                                yield from active.evaluate(context.fork())
+                            else:
+                                active.evaluate(context.fork())
+                        # Pop the stack
+                        active      = active.parent
+                        active_type = type(active) if active else None
                         # Move on to the next line
                         continue
                 # Test if the line matches a floating directive
-                floating = re_floating.match(line)
-                if floating != None:
-                    prior, tag, arguments = floating.groups()
-                    tag                   = tag.lower()
+                directive = re_floating(line)
+                if directive:
+                    prior, tag, arguments = directive.groups()
+                    tag                   = intern(tag.lower())
                     arguments             = arguments.strip()
-                    d_wrap                = self.get_directive(tag)
-                    if d_wrap and d_wrap.is_block:
+                    d_wrap, role          = lookup_dirx(tag)
+                    if role is not None and role != role_line:
                         raise PrologueError(
                             f"The directive '{tag}' can only be used with an "
                             f"anchored delimiter as it is a block directive"
                         )
-                    elif d_wrap:
-                        if arguments.endswith(":"): arguments = arguments[:-1]
+                    elif role == role_line:
+                        if arguments.endswith(":"): arguments = arguments[:-1].rstrip()
                         # Yield the text before the directive
                         yield line.encase(prior.rstrip())
                         # Yield the contents returned from the directive
@@ -431,7 +607,7 @@ class Prologue(object):
                             active, src_file=r_file, src_line=(idx + 1),
                             callback=callback,
                         )
-                        l_dir.invoke(tag, arguments.strip())
+                        l_dir.invoke(tag, arguments)
                         if   active      : active.append(l_dir)
                         elif l_dir.yields: yield from l_dir.evaluate(context)
                         else             : l_dir.evaluate(context)
@@ -457,6 +633,8 @@ class Prologue(object):
                 f"Unmatched {type(active).__name__} block directive in "
                 f"{src_file.path}:{src_line}:" + "\n" + snippet
             )
+        # Remember if the file can be passed straight through in future
+        if is_plain: plain.add(r_file)
         # Pop the file being parsed from the stack
         if context.stack_pop() != r_file:
             raise PrologueError("File stack has been corrupted")
@@ -14,13 +14,54 @@
 
 from .common import PrologueError
 
+# Directive class, bound late by the directives package to break the import cycle
+# NOTE: Directive subclasses Block, so it cannot be imported at module level
+_Directive = None
+
+def _set_directive(cls):
+    """ Register the Directive class for use when classifying block entries.
+
+    Args:
+        cls: The Directive class
+    """
+    global _Directive
+    _Directive = cls
+
 class Block:
     """ Represents a block of lines between opening and closing delimiters """
 
+    # NOTE: Attributes are held in slots, '__dict__' is kept so that subclasses
+    #       (including user directives) can still attach arbitrary attributes
+    __slots__ = (
+        "parent", "__kinds", "__entries", "__content", "__dict__", "__weakref__",
+    )
+
+    # Kinds of entry that can be held within a block
+    # NOTE: The kind is determined when an entry is appended, so that the
+    #       entries don't need to be type checked on every evaluation
+    LINE     = 0
+    YIELDING = 1
+    SILENT   = 2
+
     def __init__(self, parent):
         """ Initialise a block with a directive. """
-        self.parent  = parent
-        self.content = []
+        self.parent    = parent
+        # NOTE: Kinds are held in a compact array in parallel with the entries,
+        #       both are private and only ever extended together by 'append'
+        self.__kinds   = bytearray()
+        self.__entries = []
+        self.__content = ()
+
+    @property
+    def content(self):
+        """ Returns a tuple of the entries held within the block.
+
+        NOTE: The tuple is only rebuilt after an entry has been appended, and
+              as it is immutable entries can only be added using 'append'
+        """
+        if len(self.__content) != len(self.__entries):
+            self.__content = tuple(self.__entries)
+        return self.__content
 
     def append(self, entry):
         """ Append either a new line of text or a nested Block instance.
@@ -28,11 +69,18 @@ class Block:
         Args:
             entry: The line of text or nested Block
         """
-        if not isinstance(entry, str) and not isinstance(entry, Block):
+        if isinstance(entry, str):
+            kind = Block.LINE
+        elif isinstance(entry, _Directive):
+            kind = Block.YIELDING if entry.yields else Block.SILENT
+        elif isinstance(entry, Block):
+            kind = Block.YIELDING
+        else:
             raise PrologueError(
                 f"Entry must be a string or Block, not {type(entry).__name__}"
             )
-        self.content.append(entry)
+        self.__kinds.append(kind)
+        self.__entries.append(entry)
 
     def evaluate(self, context):
         """ Evaluate the block and stream complete lines back to Prologue.
@@ -42,17 +90,41 @@ class Block:
 
         Yields: A line of text at a time
         """
-        from .directives.base import Directive
-        for entry in self.content:
-            if (
-                (    isinstance(entry, Directive) and entry.yields            ) or
-                (not isinstance(entry, Directive) and isinstance(entry, Block))
-            ):
-                yield from entry.evaluate(context)
-            elif isinstance(entry, Directive):
-                entry.evaluate(context)
+        line, yielding = Block.LINE, Block.YIELDING
+        for kind, entry in zip(self.__kinds, self.__entries):
+            if   kind == line    : yield entry
+            elif kind == yielding: yield from entry.evaluate(context)
+            else                 : entry.evaluate(context)
+
+    def evaluate_substituted(self, context):
+        """
+        Evaluate the block, performing in-line substitutions on every line as
+        it is produced.
+
+        NOTE: No directive is evaluated between consecutive lines held directly
+              by this block, so each run of them sees the same defines and is
+              substituted as a single batch
+
+        Args:
+            context: Context object at the point of evaluation
+
+        Yields: A substituted line of text at a time
+        """
+        line, yielding = Block.LINE, Block.YIELDING
+        run = []
+        for kind, entry in zip(self.__kinds, self.__entries):
+            if kind == line:
+                run.append(entry)
+                continue
+            if run:
+                yield from context.substitute_many(run)
+                run = []
+            if kind == yielding:
+                for sub_line in entry.evaluate(context):
+                    yield context.substitute(sub_line)
             else:
-                yield entry
+                entry.evaluate(context)
+        if run: yield from context.substitute_many(run)
 
     @property
     def stack(self):
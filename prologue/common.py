@@ -19,6 +19,10 @@ class PrologueError(Exception):
 class Line(str):
     """ Carries a line from a file, along with the line number and file pointer """
 
+    # NOTE: Many lines are created during evaluation, so attributes are held in
+    #       slots rather than a per-instance dictionary
+    __slots__ = ("file", "number")
+
     def __new__(cls, line, file, number):
         return super().__new__(cls, line)
 
@@ -35,6 +39,22 @@ class Line(str):
         self.file   = file
         self.number = number
 
+    @classmethod
+    def _fast(cls, line, file, number):
+        """
+        Create a line without sanity checks, for use where the file pointer and
+        line number are already known to be valid.
+
+        Args:
+            line  : The string representing the line
+            file  : Pointer to the file that contains this line
+            number: The line number (minimum value of 1) within the file
+        """
+        inst        = str.__new__(cls, line)
+        inst.file   = file
+        inst.number = number
+        return inst
+
     def __repr__(self):
         return f"{self.file}@{self.number}: {self.__str__()}"
 
@@ -44,7 +64,7 @@ class Line(str):
         Args:
             substring: The substring to encase
         """
-        return Line(str(substring), self.file, self.number)
+        return Line._fast(str(substring), self.file, self.number)
 
     def __getitem__(self, item):
         """ Custom handler for accessing single character or range in a line.
@@ -16,6 +16,9 @@ import ast
 import re
 import shlex
 import sys
+from collections import ChainMap
+from functools import lru_cache
+from types import MappingProxyType
 
 # Support AST unparsing across multiple Python versions
 # NOTE: Before Python 3.9, unparse was not a native function
@@ -27,6 +30,60 @@ else:
 from .common import PrologueError, Line
 from .registry import RegistryFile
 
+# Sentinel used to detect missing defines with a single lookup
+MISSING = object()
+
+# Expressions made up only of numeric literals and arithmetic operators
+RGX_ARITH = re.compile(r"[0-9\s.+\-*/%()]+")
+
+@lru_cache(maxsize=32)
+def compile_style(explicit_style):
+    """ Compile the regular expressions for variable substitution.
+
+    Args:
+        explicit_style: Tuple of strings that define the explicit style
+
+    Returns: Tuple of the explicit and implicit substitution expressions
+    """
+    # NOTE: The delimiters are escaped as literals (rather than each character
+    #       being wrapped in a class) so that the engine can scan directly for
+    #       the literal prefix
+    rgx_exp_str = r"(" + re.escape(explicit_style[0])
+    if explicit_style[1]:
+        rgx_exp_str += r".*?"
+        rgx_exp_str += re.escape(explicit_style[1])
+    else:
+        rgx_exp_str += r"[a-z_][a-z0-9_]+"
+    rgx_exp_str += r")"
+    return (
+        re.compile(rgx_exp_str, flags=re.IGNORECASE),
+        re.compile(r"\b([a-z][a-z0-9_]{0,})\b", flags=re.IGNORECASE),
+    )
+
+class ReplaceVar(ast.NodeTransformer):
+    """ AST transformation replacing variables with the values of defines """
+
+    def __init__(self, ctx):
+        """ Initialise the transformation.
+
+        Args:
+            ctx: The context to take the values of defines from
+        """
+        super().__init__()
+        self.ctx      = ctx
+        self.replaced = 0
+
+    def visit_Name(self, node):
+        if self.ctx.has_define(node.id):
+            self.replaced += 1
+            value = self.ctx.get_define(node.id)
+            if not isinstance(value, str):
+                return ast.Constant(value=value, kind=type(value))
+            else:
+                return self.ctx.parse_value(value)
+        else:
+            return ast.Constant(value=node.id, kind=type(node.id))
+
 class Context(object):
     """ Keeps track of the parser's context """
 
@@ -58,9 +115,29 @@ class Context(object):
         self.explicit_style = explicit_style
         self.allow_redefine = allow_redefine
         self.__defines      = {}
-        self.__removed      = []
+        self.__removed      = set()
         self.__stack        = []
+        self.__stack_count  = {}
         self.__trace        = []
+        self.__plain        = set()
+        # Generation of the defines, shared by every context forked from the
+        # root and bumped whenever any of them is modified
+        # NOTE: This is held in a single-entry list so that it can be shared by
+        #       reference, rather than walking up to the root to read it
+        self.__generation   = (
+            parent.__generation if isinstance(parent, Context) else [0]
+        )
+        # Memo of flattened expressions, valid for a single generation
+        self.__flat_cache   = {}
+        self.__flat_gen     = 0
+        # Chained view of the defines from this context up to the root, built
+        # on the parent's own chain rather than its public read-only view
+        if isinstance(parent, Context):
+            self.__chain = parent.__chain.new_child(self.__defines)
+        elif parent:
+            self.__chain = ChainMap(self.__defines, parent.defines)
+        else:
+            self.__chain = ChainMap(self.__defines)
         # Populate initial state
         if isinstance(initial_state, dict):
             for key, value in initial_state.items():
@@ -73,28 +150,38 @@ class Context(object):
                         f"Values must be string, integer, float, or Boolean in "
                         f"the initial state, not: {value}"
                     )
-                self.__defines[key] = value
+                self.__defines[sys.intern(key)] = value
         elif initial_state != None:
             raise PrologueError(
                 f"Initial state must be a dictionary, not: {initial_state}"
             )
-        # Define regular expression for variable substitution
-        rgx_exp_str = r"(" + "".join(f"[{x}]" for x in self.explicit_style[0])
-        if explicit_style[1]:
-            rgx_exp_str += r".*?"
-            rgx_exp_str += "".join(f"[{x}]" for x in self.explicit_style[1])
-        else:
-            rgx_exp_str += r"[a-z_][a-z0-9_]+"
-        rgx_exp_str += r")"
-        self.rgx_exp = re.compile(rgx_exp_str, flags=re.IGNORECASE)
-        self.rgx_imp = re.compile(r"\b([a-z][a-z0-9_]{0,})\b", flags=re.IGNORECASE)
+        # Regular expressions for variable substitution, shared between all
+        # contexts using the same explicit style (e.g. every fork of a context)
+        self.rgx_exp, self.rgx_imp = compile_style(tuple(explicit_style))
+        # Slice bounds of the expression within an explicit substitution
+        self.__exp_start = len(explicit_style[0])
+        self.__exp_end   = -len(explicit_style[1]) or None
 
     @property
     def defines(self):
-        """ Returns all defines across the full stack of context objects """
-        return {
-            **(self.parent.defines if self.parent else {}), **self.__defines
-        }
+        """ Returns a view of all defines across the full stack of contexts.
+
+        NOTE: A ChainMap layers this context's defines over the parent's view,
+              so forked contexts never copy the full set of defines. It is
+              wrapped in a read-only proxy, as writing through it would bypass
+              the generation used to invalidate cached evaluations. Unlike the
+              dictionary previously returned, the view is live and can't be
+              modified or serialised directly - use 'copy_defines' to get a
+              dictionary snapshot instead.
+        """
+        return MappingProxyType(self.__chain)
+
+    def copy_defines(self):
+        """ Returns a copy of all defines across the full stack of contexts.
+
+        Returns: Dictionary of keys and values, unaffected by later changes
+        """
+        return dict(self.__chain)
 
     @property
     def root(self):
@@ -111,6 +198,14 @@ class Context(object):
         """ Returns the root file trace object """
         return self.root.trace if self.parent else self.__trace
 
+    @property
+    def plain(self):
+        """
+        Returns the root set of files found to contain no directives, comments,
+        or line continuations
+        """
+        return self.root.plain if self.parent else self.__plain
+
     # ==========================================================================
     # File Stack Management
     # ==========================================================================
@@ -126,21 +221,29 @@ class Context(object):
             raise PrologueError(
                 f"Trying to push {file} to stack - must be a RegistryFile"
             )
-        # Push to stack
-        self.stack.append(file)
+        # The stack is held by the root context
+        if self.parent: return self.root.stack_push(file)
+        # Push to stack, counting occurrences for fast membership tests
+        self.__stack.append(file)
+        self.__stack_count[file] = self.__stack_count.get(file, 0) + 1
         # Also push file to the trace - it records order files were read
-        self.trace.append(file)
+        self.__trace.append(file)
 
     def stack_pop(self):
         """ Pop a file from the stack.
 
         Returns: Next instance of RegistryFile from the top of the stack.
         """
+        # The stack is held by the root context
+        if self.parent: return self.root.stack_pop()
         # Sanity check
-        if len(self.stack) == 0:
+        if len(self.__stack) == 0:
             raise PrologueError("Trying to pop file from empty stack")
         # Pop the top entry off the stack
-        return self.stack.pop()
+        file = self.__stack.pop()
+        self.__stack_count[file] -= 1
+        if self.__stack_count[file] == 0: del self.__stack_count[file]
+        return file
 
     def stack_top(self):
         """ Get the top RegistryFile instance from the stack (if any exist).
@@ -150,6 +253,18 @@ class Context(object):
         # Return the top item off the stack
         return self.stack[-1] if len(self.stack) > 0 else None
 
+    def stack_contains(self, file):
+        """ Test whether a RegistryFile instance is currently on the stack.
+
+        Args:
+            file: Instance of RegistryFile to look for
+
+        Returns: True if the file is on the stack, False otherwise
+        """
+        # The stack is held by the root context
+        if self.parent: return self.root.stack_contains(file)
+        return file in self.__stack_count
+
     # ==========================================================================
     # Defined Constant Handling
     # ==========================================================================
@@ -170,7 +285,7 @@ class Context(object):
             )
         # Warn about collision
         if check:
-            if key in self.defines and not key in self.__removed:
+            if key in self.__chain and not key in self.__removed:
                 msg = (
                     f"Value already defined for key '{key}' with value "
                     f"{self.get_define(key)}"
@@ -182,9 +297,14 @@ class Context(object):
         # If the value is a number, convert it
         if isinstance(value, str) and value.strip().isdigit(): value = int(value)
         # Store the define
+        # NOTE: Keys are interned as the names found when parsing expressions
+        #       are also interned, so lookups can resolve by identity
+        key = sys.intern(key)
         self.__defines[key] = value
-        # Clear define name from 'removed' array, if present
-        if key in self.__removed: self.__removed.remove(key)
+        # Clear define name from 'removed' set, if present
+        self.__removed.discard(key)
+        # Invalidate any flattened expressions
+        self.__generation[0] += 1
 
     def clear_define(self, key):
         """
@@ -194,12 +314,14 @@ class Context(object):
         Args:
             key: The key of the defined value
         """
-        if key not in self.defines:
-            raise PrologueError(f"No value has been defined for key '{key}'")
         if key in self.__defines:
             del self.__defines[key]
+        elif key in self.__chain:
+            self.__removed.add(key)
         else:
-            self.__removed.append(key)
+            raise PrologueError(f"No value has been defined for key '{key}'")
+        # Invalidate any flattened expressions
+        self.__generation[0] += 1
 
     def has_define(self, key):
         """ Check if a variable has been defined.
@@ -209,6 +331,9 @@ class Context(object):
 
         Returns: True if defined, False otherwise
         """
+        # NOTE: Each level is tested directly rather than through a snapshot of
+        #       all keys in scope, so that modifying a define never has to pay
+        #       for rebuilding the snapshot
         # If removed at this level, immediately return False
         if key in self.__removed: return False
         # If defined at this level, immediately return True
@@ -228,12 +353,14 @@ class Context(object):
         """
         if key in self.__removed:
             raise PrologueError(f"No value has been defined for key '{key}'")
-        elif key not in self.__defines:
+        # Lookup the value at this level, deferring to the parent if not found
+        value = self.__defines.get(key, MISSING)
+        if value is MISSING:
             if self.parent:
                 return self.parent.get_define(key)
             else:
                 raise PrologueError(f"No value has been defined for key '{key}'")
-        return self.defines[key]
+        return value
 
     # ==========================================================================
     # Forking and Joining
@@ -266,9 +393,48 @@ class Context(object):
     # Expression Evaluation
     # ==========================================================================
 
+    # Maximum number of flattened expressions to memoise per context
+    FLAT_CACHE_SIZE = 4096
+
+    # Compiled code for flattened expressions, shared by all contexts as the
+    # compilation only depends on the flattened string
+    CODE_CACHE      = {}
+    CODE_CACHE_SIZE = 1024
+
+    # Results of flattened expressions holding only arithmetic on literals
+    NUMERIC_CACHE      = {}
+    NUMERIC_CACHE_SIZE = 1024
+
+    # Parsed AST nodes of string values held by defines, shared by all contexts
+    VALUE_CACHE      = {}
+    VALUE_CACHE_SIZE = 1024
+
     def flatten(self, expr, history=None):
         """ Flatten an expression by substituting for known variables.
 
+        Args:
+            expr   : The expression to flatten
+            history: Tracks expressions to avoid deadlock
+
+        Returns: String with each recognised variable substituted for its value
+        """
+        # Discard memoised results if any define has changed since they were
+        # recorded, as a define anywhere up the stack can alter the result
+        generation = self.__generation[0]
+        if generation != self.__flat_gen:
+            self.__flat_cache.clear()
+            self.__flat_gen = generation
+        result = self.__flat_cache.get(expr, None)
+        if result is None:
+            result = self.__flatten(expr, history)
+            if len(self.__flat_cache) >= Context.FLAT_CACHE_SIZE:
+                self.__flat_cache.clear()
+            self.__flat_cache[expr] = result
+        return result
+
+    def __flatten(self, expr, history):
+        """ Flatten an expression without consulting the memo.
+
         Args:
             expr   : The expression to flatten
             history: Tracks expressions to avoid deadlock
@@ -278,35 +444,48 @@ class Context(object):
         # Create a history if one doesn't already exist
         if not history: history = []
         history.append(expr)
-        # Declare a AST node transformation to replace variables
-        ctx      = self
-        replaced = [0]
-        class ReplaceVar(ast.NodeTransformer):
-            def visit_Name(self, node):
-                if ctx.has_define(node.id):
-                    replaced[0] += 1
-                    value = ctx.get_define(node.id)
-                    if not isinstance(value, str):
-                        return ast.Constant(value=value, kind=type(value))
-                    else:
-                        return ast.parse(value).body[0]
-                else:
-                    return ast.Constant(value=node.id, kind=type(node.id))
+        # A bare reference to an integer (or Boolean) define flattens to the
+        # value's representation, so skip the AST round trip
+        # NOTE: This matches what unparsing the substituted constant produces
+        if expr.isidentifier() and self.has_define(expr):
+            value = self.get_define(expr)
+            if isinstance(value, int): return repr(value)
+        # Transformation to replace variables
+        replacer = ReplaceVar(self)
         # Iterate repeating variables (constants may reference other constants)
         result = expr
         while True:
             # If result is no longer a string, break out
             if not isinstance(result, str): break
             # If it's not a constant, then try to substitute
-            replaced[0] = 0
+            replacer.replaced = 0
             try:
                 # Walk the AST substituting variables -> constants
-                result = unparse(ReplaceVar().visit(ast.parse(result)))
+                result = unparse(replacer.visit(ast.parse(result)))
             except TypeError:
                 break
-            if replaced[0] == 0: break
+            if replacer.replaced == 0: break
         return result
 
+    def parse_value(self, value):
+        """ Parse a string value into an AST node, reusing earlier parses.
+
+        NOTE: The parsed nodes are shared between every flatten, this is safe as
+              the trees they are placed into are only ever unparsed.
+
+        Args:
+            value: The string value to parse
+
+        Returns: The AST node of the value
+        """
+        node = Context.VALUE_CACHE.get(value, None)
+        if node is None:
+            node = ast.parse(value).body[0]
+            if len(Context.VALUE_CACHE) >= Context.VALUE_CACHE_SIZE:
+                Context.VALUE_CACHE.clear()
+            Context.VALUE_CACHE[value] = node
+        return node
+
     def evaluate(self, expr):
         """ Flatten an expression, then evaluate it.
 
@@ -315,13 +494,40 @@ class Context(object):
 
         Returns: Result of the expression
         """
+        # A bare reference to an integer (or Boolean) define is its own value
+        expr = expr.strip()
+        if expr.isidentifier() and self.has_define(expr):
+            value = self.get_define(expr)
+            if isinstance(value, int): return value
         # First flatten out variable references
-        flat = self.flatten(expr.strip())
+        flat = self.flatten(expr)
+        # Return the result of arithmetic on literals if already known
+        value = Context.NUMERIC_CACHE.get(flat, MISSING)
+        if value is not MISSING: return value
+        # Compile the flattened expression, reusing earlier compilations
+        # NOTE: Flattened strings that can't be compiled are recorded as None
+        code = Context.CODE_CACHE.get(flat, MISSING)
+        if code is MISSING:
+            try:
+                code = compile(flat.strip(" \t"), "<prologue>", "eval")
+            except Exception:
+                code = None
+            if len(Context.CODE_CACHE) >= Context.CODE_CACHE_SIZE:
+                Context.CODE_CACHE.clear()
+            Context.CODE_CACHE[flat] = code
+        if code is None: return flat
         # Now evaluate (if we can)
         try:
-            return eval(flat, { "__builtins__": None }, { })
+            value = eval(code, { "__builtins__": None }, { })
         except Exception:
             return flat
+        # Record the result if the expression is arithmetic on literals alone,
+        # as evaluating it again must give the same number
+        if type(value) in (int, float, bool) and RGX_ARITH.fullmatch(flat):
+            if len(Context.NUMERIC_CACHE) >= Context.NUMERIC_CACHE_SIZE:
+                Context.NUMERIC_CACHE.clear()
+            Context.NUMERIC_CACHE[flat] = value
+        return value
 
     def substitute(self, line, implicit=None):
         """ Perform in-line substitutions for recognised variables.
@@ -332,33 +538,94 @@ class Context(object):
 
         Returns: Line with values substituted
         """
+        return Line._fast(
+            self.__substitute(str(line), implicit), line.file, line.number
+        )
+
+    def substitute_into(self, line, lookup_append=None, implicit=None):
+        """
+        Perform in-line substitutions for recognised variables, returning a
+        plain string rather than a Line and optionally recording the source.
+
+        Args:
+            line         : The line to perform substitution on
+            lookup_append: Optional callable to receive a tuple of the source
+                           file and line number (default: None)
+            implicit     : Enable implicit substitutions
+
+        Returns: String with values substituted
+        """
+        if lookup_append: lookup_append((line.file, line.number))
+        return self.__substitute(str(line), implicit)
+
+    def substitute_many(self, lines, implicit=None):
+        """
+        Perform in-line substitutions across many lines, with a single pass of
+        each expression over all of them.
+
+        NOTE: Lines are joined by newlines, which no substitution can span, and
+              every line sees the same defines. If any line or substituted value
+              holds a newline, the lines are substituted one at a time instead.
+
+        Args:
+            lines   : The lines to perform substitution on
+            implicit: Enable implicit substitutions
+
+        Returns: List of lines with values substituted
+        """
+        lines = list(lines)
+        # A single line gains nothing from joining and splitting
+        if len(lines) == 1: return [self.substitute(lines[0], implicit)]
+        texts = [str(x) for x in lines]
+        parts = None
+        blob  = "\n".join(texts)
+        if blob.count("\n") == len(texts) - 1:
+            parts = self.__substitute(blob, implicit).split("\n")
+        if parts is None or len(parts) != len(texts):
+            parts = [self.__substitute(x, implicit) for x in texts]
+        return [Line._fast(x, y.file, y.number) for x, y in zip(parts, lines)]
+
+    def __substitute(self, line, implicit):
+        """ Perform in-line substitutions on a plain string.
+
+        Args:
+            line    : The string to perform substitution on
+            implicit: Enable implicit substitutions (None uses instance default)
+
+        Returns: String with values substituted
+        """
         # If implicit not given, then it defaults to instance version
         if implicit == None: implicit = self.implicit_sub
-        # Pickup the input line's attributes
-        f_file, f_line, line = line.file, line.number, str(line)
         # First look for explicit substitutions of the form '$(x)'
-        exp_match = [x for x in self.rgx_exp.finditer(line)]
-        final     = ""
-        exp_match = [x for x in self.rgx_exp.finditer(line)]
-        for match in exp_match[::-1]:
-            m_expr  = match.groups()[0][
-                len(self.explicit_style[0]):
-                len(match.groups()[0])-len(self.explicit_style[1])
-            ]
-            sub_val = self.evaluate(m_expr)
-            line    = (
-                line[:match.span()[0]] + str(sub_val) + line[match.span()[1]:]
-            )
+        # NOTE: Each pass substitutes every match with a single call to 'sub',
+        #       rather than slicing the line apart once per match
+        line = self.rgx_exp.sub(self.__sub_explicit, line)
         # Secondly look for implicit substitutions
-        if implicit:
-            imp_match = [x for x in self.rgx_imp.finditer(line)]
-            # Substitute each identified variable
-            for match in imp_match[::-1]:
-                if self.has_define(match.groups()[0]):
-                    line = (
-                        line[:match.span()[0]] +
-                        str(self.evaluate(match.groups()[0])) +
-                        line[match.span()[1]:]
-                    )
+        # NOTE: With no defines in scope nothing can be substituted, so the pass
+        #       is skipped rather than testing every identifier in the line
+        if implicit and self.__chain:
+            line = self.rgx_imp.sub(self.__sub_implicit, line)
         # Return the finished string
-        return Line(line, f_file, f_line)
+        return line
+
+    def __sub_explicit(self, match):
+        """ Evaluate the expression held within an explicit substitution.
+
+        Args:
+            match: Match of the explicit substitution expression
+
+        Returns: String of the evaluated expression
+        """
+        expr = match.group(1)[self.__exp_start:self.__exp_end]
+        return str(self.evaluate(expr))
+
+    def __sub_implicit(self, match):
+        """ Evaluate an implicit substitution, if the variable is defined.
+
+        Args:
+            match: Match of the variable name
+
+        Returns: String of the evaluated variable, or the original text
+        """
+        name = match.group(1)
+        return str(self.evaluate(name)) if self.has_define(name) else name
@@ -18,20 +18,22 @@ from .for_loop import ForLoop
 from .include import Include, Import
 from .message import Message
 
+# Prime directives, in the order they are registered
+PRIME_DIRECTIVES = (
+    # Message directives
+    Message,
+    # Variable define/undefine
+    Define, Undefine,
+    # Logical directives
+    Conditional, ForLoop,
+    # Include/import directives
+    Include, Import,
+)
+
 def register_prime_directives(pro):
     """ Register prime directives onto an instance of Prologue.
 
     Args:
         pro: Pointer to Prologue instance
     """
-    # Register message directives
-    pro.register_directive(Message)
-    # Variable define/undefine
-    pro.register_directive(Define)
-    pro.register_directive(Undefine)
-    # Register logical directives
-    pro.register_directive(Conditional)
-    pro.register_directive(ForLoop)
-    # Include/import directives
-    pro.register_directive(Include)
-    pro.register_directive(Import)
+    for dirx in PRIME_DIRECTIVES: pro.register_directive(dirx)
@@ -12,14 +12,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
 import shlex
 
 from ..common import PrologueError
-from ..block import Block
+from ..block import Block, _set_directive
+
+# Argument strings made up of plain words and simply quoted sections, which can
+# be split without the full shell lexer
+# NOTE: Anything with a backslash, an unterminated quote, or quotes adjoining
+#       other text falls back to shlex, which handles escaping and joining
+RGX_SIMPLE_ARGS = re.compile(
+    r"""[ \t\r\n]*(?:(?:"[^"\\]*"|'[^']*'|[^ \t\r\n"'\\]+)(?:[ \t\r\n]+|\Z))*"""
+)
+RGX_SIMPLE_ARG  = re.compile(r""""([^"\\]*)"|'([^']*)'|([^ \t\r\n"'\\]+)""")
 
 class Directive(Block):
     UUID = 0
 
+    __slots__ = (
+        "__uuid", "__yields", "__source", "__callback", "__last_args",
+        "__last_parts",
+    )
+
     def __init__(
         self, parent, yields=True, src_file=None, src_line=0, callback=None,
     ):
@@ -33,16 +48,23 @@ class Directive(Block):
             callback: External callback routine to expose parse state
         """
         super().__init__(parent)
-        self.__uuid     = BlockDirective.issue_uuid()
+        self.__uuid     = None
         self.__yields   = yields
         self.__source   = (src_file, src_line)
         self.__callback = callback
+        # Most recently split argument string, along with its parts
+        self.__last_args  = None
+        self.__last_parts = ()
 
     @property
     def yields(self): return self.__yields
 
     @property
-    def uuid(self): return self.__uuid
+    def uuid(self):
+        # NOTE: Identifiers are issued on first access rather than construction,
+        #       as most directives are never asked for one
+        if self.__uuid is None: self.__uuid = Directive.issue_uuid()
+        return self.__uuid
 
     @property
     def source(self): return self.__source
@@ -64,7 +86,18 @@ class Directive(Block):
 
         Returns: Array of sections
         """
-        return shlex.split(args)
+        # Directives commonly count and then fetch arguments from the same
+        # string, so reuse the last split if it was of the same string
+        if args != self.__last_args:
+            if RGX_SIMPLE_ARGS.fullmatch(args):
+                parts = [
+                    x.group(x.lastindex) for x in RGX_SIMPLE_ARG.finditer(args)
+                ]
+            else:
+                parts = shlex.split(args)
+            self.__last_args  = args
+            self.__last_parts = tuple(parts)
+        return list(self.__last_parts)
 
     def count_args(self, args):
         """ Count the number of arguments found, paying attention to quotes.
@@ -87,6 +120,8 @@ class Directive(Block):
         parts = self.split_args(args)
         return parts[index] if index < len(parts) else default
 
+_set_directive(Directive)
+
 class BlockDirective(Directive):
     """
     A block directive contains lines and other directives for which evaluation
@@ -94,6 +129,8 @@ class BlockDirective(Directive):
     closing tag, but can also be split into multiple sections using transitions.
     """
 
+    __slots__ = ("__opened", "__closed")
+
     def __init__(
         self, parent, yields=True, src_file=None, src_line=0, callback=None
     ):
@@ -170,6 +207,8 @@ class LineDirective(Directive):
     it is embedded within a block directive.
     """
 
+    __slots__ = ()
+
     def __init__(
         self, parent, yields=False, src_file=None, src_line=0, callback=None,
     ):
@@ -17,9 +17,26 @@ from enum import IntEnum, auto
 from .base import Directive, BlockDirective, LineDirective
 from ..common import PrologueError
 
+class TagRole(IntEnum):
+    """ Role a tag plays within a directive """
+    LINE       = auto()
+    OPENING    = auto()
+    TRANSITION = auto()
+    CLOSING    = auto()
+
 class DirectiveWrap(object):
     """ Decorator around a directive class or function """
 
+    # NOTE: Attributes are held in slots, '__dict__' is kept so that arbitrary
+    #       attributes can still be attached to an instance. The wrapper is not
+    #       modified once constructed, so derived values are computed up front.
+    __slots__ = (
+        "directive", "opening", "closing", "transition", "__is_block",
+        "__is_line", "__tags", "__roles",
+        "__opening_set", "__closing_set", "__transition_set", "__known_set",
+        "__dict__", "__weakref__",
+    )
+
     def __init__(self, dirx, opening, closing=None, transition=None):
         """ Initialise the wrapper
 
@@ -34,6 +51,8 @@ class DirectiveWrap(object):
         self.directive = dirx
         if not issubclass(dirx, Directive):
             raise PrologueError(f"Item is not a subclass of Directive: {dirx}")
+        self.__is_block = issubclass(dirx, BlockDirective)
+        self.__is_line  = issubclass(dirx, LineDirective)
         # Force tags to be case insensitive
         if opening   : opening    = [x.lower() for x in opening   ]
         if closing   : closing    = [x.lower() for x in closing   ]
@@ -64,27 +83,37 @@ class DirectiveWrap(object):
         self.opening    = opening
         self.closing    = closing if closing else tuple()
         self.transition = transition if transition else tuple()
+        self.__tags     = self.opening + self.transition + self.closing
+        # Hold each group of tags as a set for constant-time membership tests
+        self.__opening_set    = frozenset(self.opening)
+        self.__closing_set    = frozenset(self.closing)
+        self.__transition_set = frozenset(self.transition)
+        self.__known_set      = (
+            self.__opening_set | self.__closing_set | self.__transition_set
+        )
+        # Classify every tag once, so that roles can be found with one lookup
+        # NOTE: Entries are added in reverse precedence, so an opening tag wins
+        #       over a transition tag, which wins over a closing tag
+        opening_role = TagRole.OPENING if self.is_block else TagRole.LINE
+        self.__roles = {}
+        self.__roles.update((x, TagRole.CLOSING   ) for x in self.closing   )
+        self.__roles.update((x, TagRole.TRANSITION) for x in self.transition)
+        self.__roles.update((x, opening_role      ) for x in self.opening   )
 
     @property
     def tags(self):
         """ Return all tags - opening and closing """
-        return (self.opening + self.transition + self.closing)
+        return self.__tags
 
     @property
     def is_block(self):
         """ Returns if this is a block directive """
-        return (
-            isinstance(self.directive, type) and
-            issubclass(self.directive, BlockDirective)
-        )
+        return self.__is_block
 
     @property
     def is_line(self):
         """ Returns if this is a line directive """
-        return (
-            isinstance(self.directive, type) and
-            issubclass(self.directive, LineDirective)
-        )
+        return self.__is_line
 
     def is_opening(self, tag):
         """ Test if a particular tag is an opening tag.
@@ -94,8 +123,8 @@ class DirectiveWrap(object):
 
         Returns: True if this is an opening tag, False otherwise
         """
-        if   tag in self.opening: return True
-        elif tag in (self.closing + self.transition): return False
+        if   tag in self.__opening_set: return True
+        elif tag in self.__known_set  : return False
         else: raise PrologueError(f"Tag is not known by directive: {tag}")
 
     def is_transition(self, tag):
@@ -106,8 +135,8 @@ class DirectiveWrap(object):
 
         Returns: True if this is a transition tag, False otherwise
         """
-        if   tag in self.transition: return True
-        elif tag in (self.opening + self.closing): return False
+        if   tag in self.__transition_set: return True
+        elif tag in self.__known_set     : return False
         else: raise PrologueError(f"Tag is not known by directive: {tag}")
 
     def is_closing(self, tag):
@@ -118,10 +147,23 @@ class DirectiveWrap(object):
 
         Returns: True if this is a closing tag, False otherwise
         """
-        if   tag in self.closing: return True
-        elif tag in (self.opening + self.transition): return False
+        if   tag in self.__closing_set: return True
+        elif tag in self.__known_set  : return False
         else: raise PrologueError(f"Tag is not known by directive: {tag}")
 
+    def role(self, tag):
+        """ Determine the role that a particular tag plays within the directive.
+
+        Args:
+            tag: The tag to classify
+
+        Returns: TagRole for the tag
+        """
+        role = self.__roles.get(tag, None)
+        if role is None:
+            raise PrologueError(f"Tag is not known by directive: {tag}")
+        return role
+
 def directive(*tags, opening=None, closing=None, transition=None):
     """ Decorator for a block directive
 
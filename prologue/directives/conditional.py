@@ -32,6 +32,13 @@ class Conditional(BlockDirective):
         self.if_section    = None
         self.elif_sections = []
         self.else_section  = None
+        # Conditions of each section in order, normalised once when the section
+        # is opened rather than on every evaluation
+        # NOTE: These are held alongside the sections, so that each section
+        #       remains a tuple of tag, arguments, and block
+        self.__conditions  = []
+        # Block of the most recently opened section, which receives new entries
+        self.__active      = None
 
     def open(self, tag, arguments):
         """ Open the conditional block with an 'if' clause.
@@ -47,6 +54,8 @@ class Conditional(BlockDirective):
         super().open(tag, arguments)
         # Record the section
         self.if_section = tag, arguments, Block(self)
+        self.__active   = self.if_section[2]
+        self.__conditions.append(self.normalise(arguments))
 
     def transition(self, tag, arguments):
         """ Transition between different sections with ELIF/ELSE.
@@ -63,10 +72,12 @@ class Conditional(BlockDirective):
         # Now perform transition
         super().transition(tag, arguments)
         # Register the tag
+        self.__active = Block(self)
         if tag == "elif":
-            self.elif_sections.append((tag, arguments, Block(self)))
+            self.elif_sections.append((tag, arguments, self.__active))
         else:
-            self.else_section = tag, arguments, Block(self)
+            self.else_section = tag, arguments, self.__active
+        self.__conditions.append(self.normalise(arguments))
 
     def close(self, tag, arguments):
         """ Close the directive block with ENDIF.
@@ -81,6 +92,17 @@ class Conditional(BlockDirective):
         # Now close tag
         super().close(tag, arguments)
 
+    @staticmethod
+    def normalise(cond):
+        """ Replace alternative syntaxes for Python operators in a condition.
+
+        Args:
+            cond: The condition to normalise
+
+        Returns: The condition using Python operators
+        """
+        return cond.replace("&&", " and ").replace("||", " or ")
+
     def append(self, entry):
         """ Append a new line or nested block to the active section.
 
@@ -93,9 +115,7 @@ class Conditional(BlockDirective):
         elif self.closed:
             raise PrologueError("Trying to append a line to a closed conditional")
         # Append to the latest open block
-        if   self.else_section          : self.else_section[2].append(entry)
-        elif len(self.elif_sections) > 0: self.elif_sections[-1][2].append(entry)
-        else                            : self.if_section[2].append(entry)
+        self.__active.append(entry)
 
     def evaluate(self, context):
         """ Selects the correct block to evaluate based upon conditions.
@@ -109,9 +129,7 @@ class Conditional(BlockDirective):
         sections = [self.if_section, *self.elif_sections]
         if self.else_section: sections.append(self.else_section)
         # Check which section is active
-        for tag, cond, block in sections:
-            # Replace alternative syntaxes for Python operators
-            cond = cond.replace("&&", " and ").replace("||", " or ")
+        for (tag, _, block), cond in zip(sections, self.__conditions):
             # Evaluate the conditional
             if (
                 (tag == "ifdef"  and     context.has_define(cond)) or
@@ -85,5 +85,4 @@ class ForLoop(BlockDirective):
             # Expose the current value of the loop variable
             context.set_define(pre_loop, entry, check=False)
             # Perform substitutions for the loop variable (and any others)
-            for line in super().evaluate(context):
-                yield context.substitute(line)
+            yield from self.evaluate_substituted(context)
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
+from itertools import islice
 from pathlib import Path
 
 from .common import PrologueError, Line
@@ -20,6 +22,9 @@ from .common import PrologueError, Line
 class RegistryFile(object):
     """ Holds a file in the registry """
 
+    # Size of the read buffer used when streaming the file's contents
+    BUFFER_SIZE = 1 << 20
+
     def __init__(self, path):
         """ Initialise the registry file
 
@@ -38,16 +43,59 @@ class RegistryFile(object):
             raise PrologueError(
                 f"Path provided is not a file {self.path}"
             )
+        # Pending background read of the file's contents, along with the state
+        # of the file when the read was scheduled
+        self.__prefetched = None
 
     @property
     def filename(self): return self.path.parts[-1]
 
+    def prefetch(self, executor):
+        """ Start reading the file's contents in the background, so that they
+        are already in memory when the file is first evaluated.
+
+        Args:
+            executor: Executor to schedule the read on
+        """
+        if self.__prefetched is None:
+            self.__prefetched = (self.__state(), executor.submit(self.__read))
+
+    def __state(self):
+        """ Capture the modification time and size of the file, used to detect
+        whether it has changed since it was prefetched.
+
+        Returns: Tuple of modification time (in nanoseconds) and size
+        """
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def __read(self):
+        """ Read all lines from the file.
+
+        Returns: List of raw lines
+        """
+        with open(self.path, "r") as fh:
+            return fh.readlines()
+
     @property
     def contents(self):
         """ Provide an iterable that reads a line at a time from the file """
-        with open(self.path, "r") as fh:
-            for idx, line in enumerate(fh.readlines()):
-                yield Line(line.rstrip(), self, idx + 1)
+        # Use contents read in the background if available, these are only held
+        # until they are first consumed and are discarded if the file has been
+        # modified since the read was scheduled
+        prefetched, self.__prefetched = self.__prefetched, None
+        if prefetched is not None:
+            state, future = prefetched
+            if state == self.__state():
+                for idx, line in enumerate(future.result(), start=1):
+                    yield Line._fast(line.rstrip(), self, idx)
+                return
+            future.cancel()
+        # NOTE: The file is streamed rather than read in full, so that only a
+        #       single buffer of the file is held in memory at any one time
+        with open(self.path, "r", buffering=RegistryFile.BUFFER_SIZE) as fh:
+            for idx, line in enumerate(fh, start=1):
+                yield Line._fast(line.rstrip(), self, idx)
 
     def snippet(self, line, before=2, after=2):
         """ Generate a snippet of the original file.
@@ -59,13 +107,12 @@ class RegistryFile(object):
 
         Returns: List of lines forming snippet
         """
+        # NOTE: Line numbers are dense, so the window can be cut directly from
+        #       the stream of lines without testing each line's number
         snippet = []
-        for s_line in self.contents:
-            # If this is before the snip point, ignore it
-            if s_line.number < (line - before): continue
-            # If this is after the snip point, break out
-            if s_line.number > (line + after): break
-            # Otherwise, build up the snippet
+        start   = max(0, line - before - 1)
+        stop    = max(start, line + after)
+        for s_line in islice(self.contents, start, stop):
             snippet.append("%4i %s %s" % (
                 s_line.number, (">>" if (s_line.number == line) else "  "),
                 str(s_line)
@@ -119,16 +166,27 @@ class RegistryFolder(object):
 class Registry(object):
     """ Keeps track of all files available to IMPORT and INCLUDE """
 
-    def __init__(self, pro, flat=False):
+    # Number of worker threads used to prefetch file contents
+    PREFETCH_WORKERS = 4
+
+    def __init__(self, pro, flat=False, prefetch=False):
         """ Initialise the registry
 
         Args:
-            pro : Pointer to the Prologue instance
-            flat: Flatten all hierarchy of folders added to the registry.
+            pro     : Pointer to the Prologue instance
+            flat    : Flatten all hierarchy of folders added to the registry.
+            prefetch: Read the contents of files added to the registry in the
+                      background, overlapping file I/O with evaluation. NOTE:
+                      every file added is read in full and held in memory until
+                      first used, including files found by 'add_folder' that are
+                      never imported or included (default: False)
         """
-        self.__pro     = pro
-        self.__flat    = flat
-        self.__entries = {}
+        self.__pro      = pro
+        self.__flat     = flat
+        self.__prefetch = prefetch
+        self.__executor = None
+        self.__entries  = {}
+        self.__resolved = {}
 
     def insert_entry(self, entry, ignore_duplicate=False):
         """ Insert an entry into the registry.
@@ -157,6 +215,30 @@ class Registry(object):
             f"Adding entry '{entry_name}' to registry: {entry.path}"
         )
         self.__entries[entry_name] = entry
+        # Clear previously resolved paths, as the new entry may change them
+        self.__resolved.clear()
+        # Start reading the file in the background if prefetching is enabled
+        if self.__prefetch and isinstance(entry, RegistryFile):
+            if not self.__executor:
+                self.__executor = ThreadPoolExecutor(
+                    max_workers=Registry.PREFETCH_WORKERS
+                )
+            entry.prefetch(self.__executor)
+
+    def close(self):
+        """ Shutdown the worker threads used to prefetch file contents, waiting
+        for any outstanding reads to complete. Prefetching restarts the workers
+        if further files are added to the registry.
+        """
+        if self.__executor:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def list_entries(self):
         """ List all files and folders present in the registry.
@@ -237,8 +319,20 @@ class Registry(object):
         Args:
             path: The path to resolve
         """
-        # Ensure this is a Path instance
-        path = Path(str(path).strip())
+        # Return a previously resolved file if possible
+        key = str(path).strip()
+        if key in self.__resolved: return self.__resolved[key]
+        # Resolve the file and remember it for subsequent lookups
+        r_file = self.__resolve(Path(key))
+        self.__resolved[key] = r_file
+        return r_file
+
+    def __resolve(self, path):
+        """ Resolve a path within the registry, bypassing the cache.
+
+        Args:
+            path: The path to resolve
+        """
         # Check if the path is absolute
         if path.is_absolute(): return RegistryFile(path)
         # Otherwise, attempt to resolve
@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest.mock import MagicMock
+
 import pytest
 
 from prologue.block import Block
+from prologue.context import Context
 from prologue.directives.base import Directive
-from prologue.common import PrologueError
+from prologue.common import PrologueError, Line
 
 def test_block_stack():
     """ Check a block is aware of its parent and can navigate the stack """
@@ -59,6 +62,62 @@ def test_block_contents():
     assert result[5] == "Line 4"
     assert was_called[0]
 
+def test_block_nested():
+    """ Test that a nested block is evaluated in place within its parent """
+    top = Block(None)
+    mid = Block(top)
+    top.append("Line 1")
+    top.append(mid)
+    mid.append("Line 2")
+    mid.append("Line 3")
+    top.append("Line 4")
+    assert [x for x in top.evaluate(None)] == ["Line 1", "Line 2", "Line 3", "Line 4"]
+    # Re-evaluating the block produces the same result
+    assert [x for x in top.evaluate(None)] == ["Line 1", "Line 2", "Line 3", "Line 4"]
+
+def test_block_content_read_only():
+    """ Check that a block's content can only be modified through append """
+    top = Block(None)
+    mid = Block(top)
+    top.append("Line 1")
+    top.append(mid)
+    mid.append("Line 2")
+    assert top.content == ("Line 1", mid)
+    # The content is immutable, so attempted modifications raise
+    with pytest.raises(AttributeError):
+        top.content.append("Line 3")
+    with pytest.raises(TypeError):
+        top.content[0] = "Line 3"
+    with pytest.raises(AttributeError):
+        top.content = ["Line 3"]
+    # Appending to the block is reflected in the content
+    top.append("Line 3")
+    assert top.content == ("Line 1", mid, "Line 3")
+    assert [x for x in top.evaluate(None)] == ["Line 1", "Line 2", "Line 3"]
+
+def test_block_evaluate_substituted():
+    """ Check runs of lines are substituted together, seeing the same defines """
+    class DefineDir(Directive):
+        def evaluate(self, ctx):
+            ctx.set_define("val", ctx.get_define("val") + 1, check=False)
+    class YieldingDir(Directive):
+        def evaluate(self, ctx):
+            yield Line("inner val", None, 4)
+    ctx   = Context(None, initial_state={ "val": 1 })
+    block = Block(None)
+    block.append(Line("first val", None, 1))
+    block.append(Line("second val", None, 2))
+    block.append(DefineDir(block, yields=False))
+    block.append(YieldingDir(block))
+    block.append(Line("third val", None, 3))
+    spy    = MagicMock(wraps=ctx.substitute_many)
+    ctx.substitute_many = spy
+    result = [x for x in block.evaluate_substituted(ctx)]
+    assert result == ["first 1", "second 1", "inner 2", "third 2"]
+    assert [x.number for x in result] == [1, 2, 4, 3]
+    # Each run of lines held directly by the block forms a single batch
+    assert [len(x[0][0]) for x in spy.call_args_list] == [2, 1]
+
 def test_block_bad_content():
     """ Try to append a bad entry to a block """
     class BadClass: pass
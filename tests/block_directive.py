@@ -49,7 +49,7 @@ def test_block_directive():
     block_dir.close(random_str(5, 10), random_str(10, 20))
     assert block_dir.opened and block_dir.closed
     # Check all lines were appended to the base block
-    assert block_dir.content == all_lines
+    assert block_dir.content == tuple(all_lines)
 
 def test_block_directive_multi_open():
     """ Try to open the block directive multiple times """
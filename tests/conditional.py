@@ -176,18 +176,18 @@ def test_conditional_append():
     # Check the lines are stored correctly for 'IF'
     assert cond.if_section[0]         == "if"
     assert cond.if_section[1]         == if_arg
-    assert cond.if_section[2].content == if_lines
+    assert cond.if_section[2].content == tuple(if_lines)
     # Now check 'ELIF' sections
     assert len(elif_args) == len(elif_lines)
     assert len(elif_args) == len(cond.elif_sections)
     for arg, lines, sect in zip(elif_args, elif_lines, cond.elif_sections):
         assert sect[0]         == "elif"
         assert sect[1]         == arg
-        assert sect[2].content == lines
+        assert sect[2].content == tuple(lines)
     # Finally check 'ELSE' section
     assert cond.else_section[0]         == "else"
     assert cond.else_section[1]         == else_arg
-    assert cond.else_section[2].content == else_lines
+    assert cond.else_section[2].content == tuple(else_lines)
 
 
 def test_conditional_append_unopened():
@@ -74,6 +74,41 @@ def test_context_inherit_defines():
     assert child_a.defines == { **root_defs, **child_a_defs }
     assert child_b.defines == { **root_defs, **child_a_defs, **child_b_defs }
 
+def test_context_defines_read_only():
+    """ Check that the defines view cannot be written to directly """
+    ctx = Context(None)
+    key = random_str(5, 10)
+    ctx.set_define(key, 1)
+    assert ctx.evaluate(key) == 1
+    # Writing through the view is rejected, so cached values can't go stale
+    with pytest.raises(TypeError):
+        ctx.defines[key] = 2
+    with pytest.raises(TypeError):
+        del ctx.defines[key]
+    assert ctx.evaluate(key) == 1
+    # Modifying through the context is reflected in the view
+    ctx.set_define(key, 3, check=False)
+    assert ctx.defines[key] == 3
+    assert ctx.evaluate(key) == 3
+
+def test_context_copy_defines():
+    """ Check that a copy of the defines is a detached dictionary """
+    root  = Context(None)
+    child = root.fork()
+    root.set_define("a", 1)
+    child.set_define("b", 2)
+    copy = child.copy_defines()
+    assert type(copy) == dict
+    assert copy == { "a": 1, "b": 2 }
+    # Later changes to the contexts don't affect the copy
+    root.set_define("c", 3)
+    child.set_define("b", 4, check=False)
+    assert copy == { "a": 1, "b": 2 }
+    assert child.copy_defines() == { "a": 1, "b": 4, "c": 3 }
+    # Modifying the copy doesn't affect the contexts
+    copy["d"] = 5
+    assert not child.has_define("d")
+
 def test_context_inherit_stack_and_trace(mocker):
     """ Test that the stack and trace are always held by the root """
     root    = Context(None)
@@ -161,6 +196,24 @@ def test_context_stack_trace_consistency(mocker):
         assert ctx.stack == state
         assert ctx.trace == trace
 
+def test_context_stack_contains(mocker):
+    """ Check that stack membership tracks pushes and pops at every level """
+    mocker.patch.object(RegistryFile, "__init__", lambda x, z: None)
+    root  = Context(None)
+    child = Context(None, parent=root)
+    files = [RegistryFile(random_str(5, 10)) for _x in range(randint(5, 10))]
+    for r_file in files:
+        assert not root.stack_contains(r_file)
+        choice((root, child)).stack_push(r_file)
+        assert root.stack_contains(r_file)
+        assert child.stack_contains(r_file)
+    while files:
+        r_file = files.pop()
+        assert choice((root, child)).stack_pop() == r_file
+        assert not root.stack_contains(r_file)
+        assert not child.stack_contains(r_file)
+        for other in files: assert child.stack_contains(other)
+
 def test_context_define_consistency():
     """ Check consistency for defining/undefining values """
     ctx   = Context(None)
@@ -431,6 +484,28 @@ def test_context_flatten_undef():
             == " ".join(out_expr).strip()
         )
 
+def test_context_flatten_memo():
+    """ Check memoised flattening tracks changes to defines up the stack """
+    root  = Context(None)
+    child = root.fork()
+    key   = random_str(5, 10)
+    # Flatten a value while it is undefined, then define it in the root
+    undef = child.flatten(key)
+    assert key in undef
+    value = randint(1, 10000)
+    root.set_define(key, value)
+    assert child.flatten(key) == str(value)
+    assert child.flatten(key) == str(value)
+    # Override it within the child
+    child.set_define(key, value + 1, check=False)
+    assert child.flatten(key) == str(value + 1)
+    assert root.flatten(key)  == str(value)
+    # Clear it from the child and then the root
+    child.clear_define(key)
+    assert child.flatten(key) == str(value)
+    root.clear_define(key)
+    assert child.flatten(key) == undef
+
 def test_context_evaluate():
     """ Evaluate a random calculation with variable substitution """
     # Build a random context
@@ -457,6 +532,36 @@ def test_context_evaluate():
         joiner = choice(("", " "))
         assert ctx.evaluate(joiner.join(in_expr)) == eval("".join(out_expr))
 
+def test_context_evaluate_code_cache():
+    """ Check compiled expressions are reused across evaluations """
+    ctx = Context(None)
+    key = random_str(5, 10)
+    ctx.set_define(key, randint(1, 10000))
+    expr = f"{key} * 3 + 1"
+    flat = ctx.flatten(expr)
+    assert ctx.evaluate(expr) == ctx.get_define(key) * 3 + 1
+    code = Context.CODE_CACHE[flat]
+    assert ctx.evaluate(expr) == ctx.get_define(key) * 3 + 1
+    assert Context.CODE_CACHE[flat] is code
+    # Redefining the value changes the flattened string, and so the code
+    ctx.set_define(key, ctx.get_define(key) + 1, check=False)
+    assert ctx.evaluate(expr) == ctx.get_define(key) * 3 + 1
+    # Arithmetic on literals alone has its result recorded
+    assert Context.NUMERIC_CACHE[ctx.flatten(expr)] == ctx.get_define(key) * 3 + 1
+    # Other expressions are not recorded
+    assert ctx.evaluate("'a' + 'b'") == "ab"
+    assert ctx.flatten("'a' + 'b'") not in Context.NUMERIC_CACHE
+
+def test_context_evaluate_bare():
+    """ Evaluate and flatten bare references to integer and Boolean defines """
+    ctx = Context(None)
+    for value in (randint(-10000, 10000), True, False):
+        key = random_str(5, 10)
+        ctx.set_define(key, value)
+        assert ctx.flatten(key)  == repr(value)
+        assert ctx.evaluate(key) == value
+        assert type(ctx.evaluate(key)) is type(value)
+
 def test_context_inline_sub():
     """ Exercise inline substitution of variables """
     # Build a random context
@@ -495,3 +600,113 @@ def test_context_inline_sub():
         assert result.__str__() == expected
         assert result.file      == full_line.file
         assert result.number    == full_line.number
+        # Test substitution into a plain string, capturing the source
+        lookup = []
+        result = ctx.substitute_into(full_line, lookup.append, implicit=implicit_sub)
+        assert type(result) == str
+        assert result == expected
+        assert lookup == [(full_line.file, full_line.number)]
+
+def test_context_inline_sub_scope():
+    """ Check implicit substitution only replaces whole names in scope """
+    root  = Context(None)
+    child = root.fork()
+    # Without any defines, lines pass through untouched
+    line = Line("abc abcd abc_1 ABC", random_str(30, 40), randint(1, 10000))
+    assert str(child.substitute(line)) == "abc abcd abc_1 ABC"
+    # Define a name in the root, which is seen by the child
+    root.set_define("abc", 1)
+    assert str(child.substitute(line)) == "1 abcd abc_1 ABC"
+    # Define a longer name in the child
+    child.set_define("abcd", 2)
+    assert str(child.substitute(line)) == "1 2 abc_1 ABC"
+    assert str(root.substitute(line))  == "1 abcd abc_1 ABC"
+    # Remove the root's define within the child
+    child.clear_define("abc")
+    assert str(child.substitute(line)) == "abc 2 abc_1 ABC"
+    assert str(root.substitute(line))  == "1 abcd abc_1 ABC"
+
+def test_context_inline_sub_skip():
+    """ Check the implicit pass is skipped when no defines are in scope """
+    root  = Context(None)
+    child = root.fork()
+    line  = Line("abc abcd", random_str(30, 40), randint(1, 10000))
+    child.rgx_imp = MagicMock(wraps=child.rgx_imp)
+    # Without any defines, the implicit expression is never run
+    assert str(child.substitute(line)) == "abc abcd"
+    assert not child.rgx_imp.sub.called
+    # Once a define is in scope, the implicit expression is run
+    root.set_define("abc", 1)
+    assert str(child.substitute(line)) == "1 abcd"
+    assert child.rgx_imp.sub.call_count == 1
+
+def test_context_shared_expressions():
+    """ Check contexts with the same explicit style share expressions """
+    root  = Context(None)
+    child = root.fork()
+    assert child.rgx_exp is root.rgx_exp
+    assert child.rgx_imp is root.rgx_imp
+    other = Context(None, explicit_style=["${", "}"])
+    assert other.rgx_exp is not root.rgx_exp
+    assert other.rgx_exp is Context(None, explicit_style=("${", "}")).rgx_exp
+
+def test_context_explicit_style():
+    """ Use explicit styles containing characters special to expressions """
+    for style in (("^(", ")"), ("[[", "]]"), ("\\{", "}")):
+        ctx = Context(None, explicit_style=style)
+        key = random_str(5, 10)
+        val = randint(1, 10000)
+        ctx.set_define(key, val)
+        line = Line(
+            f"a {style[0]}{key}{style[1]} b", random_str(30, 40), randint(1, 10000)
+        )
+        assert str(ctx.substitute(line, implicit=False)) == f"a {val} b"
+
+def test_context_parse_value():
+    """ Check string values are parsed once and reused when flattening """
+    ctx = Context(None)
+    key_a, key_b = random_str(5, 10), random_str(5, 10)
+    ctx.set_define(key_a, "x + y")
+    ctx.set_define(key_b, "x + y")
+    node = ctx.parse_value("x + y")
+    assert ctx.parse_value("x + y") is node
+    # Both defines flatten in the same way
+    assert ctx.flatten(key_a) == ctx.flatten(key_b)
+    assert Context.VALUE_CACHE["x + y"] is node
+    # The parsed value is still flattened against the current defines
+    ctx.set_define("x", 2)
+    ctx.set_define("y", 3)
+    assert ctx.evaluate(key_a) == 5
+    ctx.set_define("y", 4, check=False)
+    assert ctx.evaluate(key_b) == 6
+
+def test_context_substitute_many():
+    """ Substitute many lines at once, checking against single substitution """
+    ctx      = Context(None)
+    ctx_defs = {}
+    gen_rand_defs(ctx, ctx_defs, [])
+    keys     = list(ctx_defs.keys())
+    # Build random lines, mixing explicit and implicit substitutions
+    lines = []
+    for idx in range(randint(10, 30)):
+        parts = []
+        for _x in range(randint(0, 10)):
+            parts.append(choice((
+                f"$({choice(keys)})", choice(keys),
+                random_str(5, 10, avoid=keys),
+            )))
+        lines.append(Line(" ".join(parts), random_str(30, 40), idx + 1))
+    for implicit in (True, False):
+        result = ctx.substitute_many(lines, implicit=implicit)
+        assert len(result) == len(lines)
+        for r_line, line in zip(result, lines):
+            assert str(r_line) == str(ctx.substitute(line, implicit=implicit))
+            assert r_line.file   == line.file
+            assert r_line.number == line.number
+    # A value holding a newline falls back to substituting line by line
+    key = random_str(5, 10, avoid=keys)
+    ctx.set_define(key, "'a\\nb'")
+    lines  = [Line(f"$({key})", "a", 1), Line(f"x $({key}) y", "b", 2)]
+    result = ctx.substitute_many(lines)
+    assert [str(x) for x in result] == ["a\nb", "x a\nb y"]
+    assert ctx.substitute_many([]) == []
@@ -18,7 +18,7 @@ from unittest.mock import MagicMock, call
 import pytest
 
 from prologue.common import PrologueError
-from prologue.directives.common import DirectiveWrap, directive
+from prologue.directives.common import DirectiveWrap, TagRole, directive
 from prologue.directives.base import BlockDirective, LineDirective, Directive
 
 from .common import random_str
@@ -148,6 +148,29 @@ def test_directive_wrap_bad():
             "character in length"
         ) == str(excinfo.value)
 
+def test_directive_wrap_role():
+    """ Check the role reported for each tag of block and line directives """
+    all_tags   = []
+    opening    = [random_str(5, 10, avoid=all_tags) for _x in range(randint(1, 5))]
+    all_tags  += opening
+    transition = [random_str(5, 10, avoid=all_tags) for _x in range(randint(1, 5))]
+    all_tags  += transition
+    closing    = [random_str(5, 10, avoid=all_tags) for _x in range(randint(1, 5))]
+    all_tags  += closing
+    # Check a block directive
+    d_wrap = DirectiveWrap(BlockDirective, opening, closing, transition)
+    for tag in opening   : assert d_wrap.role(tag.lower()) == TagRole.OPENING
+    for tag in transition: assert d_wrap.role(tag.lower()) == TagRole.TRANSITION
+    for tag in closing   : assert d_wrap.role(tag.lower()) == TagRole.CLOSING
+    # Check a line directive
+    d_wrap = DirectiveWrap(LineDirective, opening)
+    for tag in opening: assert d_wrap.role(tag.lower()) == TagRole.LINE
+    # Check an unknown tag
+    bad_tag = random_str(5, 10, avoid=[x.lower() for x in all_tags]).lower()
+    with pytest.raises(PrologueError) as excinfo:
+        d_wrap.role(bad_tag)
+    assert f"Tag is not known by directive: {bad_tag}" == str(excinfo.value)
+
 def test_directive_decorator_bad():
     """ Test the @directive decorator on a non-BlockDirective/LineDirective """
     class DummyA(): pass
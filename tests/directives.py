@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import shlex
 from random import randint
 from unittest.mock import MagicMock, call
 
@@ -46,6 +47,13 @@ def test_directive_uuid():
     # Check UUIDs issued correctly
     for idx, dirx in enumerate(dir_insts):
         assert dirx.uuid == (start_point + idx)
+    # Check UUIDs are stable once issued
+    for idx, dirx in enumerate(dir_insts):
+        assert dirx.uuid == (start_point + idx)
+    # Check UUIDs are issued in order of first access
+    dir_insts = [Directive(None) for _x in range(10)]
+    for idx, dirx in enumerate(dir_insts[::-1]):
+        assert dirx.uuid == (start_point + 10 + idx)
 
 def test_directive_split_args():
     """ Test splitting arguments paying attention to quotes """
@@ -63,6 +71,35 @@ def test_directive_split_args():
     parts = dirx.split_args('Banana apple "hello \'world how\' are you?" 4321')
     assert parts == ["Banana", "apple", "hello 'world how' are you?", "4321"]
 
+def test_directive_split_args_shell():
+    """ Check splitting arguments matches shell-style splitting in edge cases """
+    dirx = Directive(None)
+    for args in (
+        "", "   ", "a\tb\n c ", '"" x', "x ''", 'a  "  "  b', "'a\\b'",
+        'a"b"', '"a"b', "'a''b'", "a\\ b", '"a\\"b"', "x # y",
+    ):
+        assert dirx.split_args(args) == shlex.split(args)
+    # Unterminated quotes are still reported
+    for args in ('"unterminated', "a 'b"):
+        with pytest.raises(ValueError):
+            dirx.split_args(args)
+
+def test_directive_split_args_reuse(mocker):
+    """ Check the last split of an argument string is reused """
+    dirx = Directive(None)
+    spy  = mocker.spy(shlex, "split")
+    args = 'a\\ b "c d" e'
+    assert dirx.count_args(args) == 3
+    assert dirx.get_arg(args, 1) == "c d"
+    assert spy.call_count == 1
+    # Modifying the returned parts doesn't affect later splits
+    dirx.split_args(args).clear()
+    assert dirx.split_args(args) == ["a b", "c d", "e"]
+    assert spy.call_count == 1
+    # A different string is split again
+    assert dirx.split_args("x\\ y") == ["x y"]
+    assert spy.call_count == 2
+
 def test_directive_count_args():
     """ Test counting arguments paying attention to quotes """
     dirx = Directive(None)
@@ -132,8 +132,10 @@ def test_for_loop_evaluate():
         ctx.flatten.side_effect = [f"range({num_rpt})"]
         def echo(input_str): return input_str
         ctx.substitute.side_effect = echo
+        ctx.substitute_many.side_effect = list
         result = [x for x in loop.evaluate(ctx)]
         assert result == (num_rpt * lines)
+        assert ctx.substitute_many.call_count == num_rpt
         ctx.flatten.assert_has_calls([call(loop_rng)])
         ctx.set_define.assert_has_calls([
             call(loop_var, x, check=False) for x in range(num_rpt)
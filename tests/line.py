@@ -118,3 +118,18 @@ def test_line_concat():
         assert l_full.file   == l_file
         assert l_full.number == l_num
 
+
+def test_line_fast():
+    """ Test that a line can be created directly from a known file and number """
+    for _x in range(100):
+        l_str  = random_str(10, 20)
+        l_file = random_str(10, 20)
+        l_num  = randint(1, 10000)
+        line   = Line._fast(l_str, l_file, l_num)
+        assert isinstance(line, Line)
+        assert line        == l_str
+        assert str(line)   == l_str
+        assert line.file   == l_file
+        assert line.number == l_num
+        # Lines hold their attributes in slots
+        assert not hasattr(line, "__dict__")
@@ -58,6 +58,10 @@ def test_prologue_bad_arguments():
     with pytest.raises(PrologueError) as excinfo:
         Prologue(register_prime=choice((123, "Hello", -4, 5.03)))
     assert str(excinfo.value).startswith("Register prime must be True or False")
+    # Use a bad prefetch setting
+    with pytest.raises(PrologueError) as excinfo:
+        Prologue(prefetch=choice((123, "Hello", -4, 5.03)))
+    assert str(excinfo.value).startswith("Prefetch must be True or False")
 
 def test_prologue_bad_delimiter():
     """ Try to setup Prologue with a bad delimiter """
@@ -73,6 +77,10 @@ def test_prologue_bad_delimiter():
     with pytest.raises(PrologueError) as excinfo:
         Prologue(delimiter=" / /")
     assert "Delimiter should not contain whitespace" in str(excinfo.value)
+    # Use a tab within the delimiter
+    with pytest.raises(PrologueError) as excinfo:
+        Prologue(delimiter="/\t/")
+    assert "Delimiter should not contain whitespace" in str(excinfo.value)
     # Check a sane value works
     assert Prologue(delimiter="//").delimiter == "//"
 
@@ -140,6 +148,26 @@ def test_prologue_add_folder(mocker):
         ignore_duplicate=ignore_dup,
     )
 
+def test_prologue_close(mocker):
+    """ Test that close releases the registry, including as a context manager """
+    pro = Prologue()
+    mocker.patch.object(pro, "registry", autospec=True)
+    pro.close()
+    pro.registry.close.assert_called_once_with()
+    pro.registry.reset_mock()
+    with pro as ctx_pro:
+        assert ctx_pro is pro
+        assert not pro.registry.close.called
+    pro.registry.close.assert_called_once_with()
+
+def test_prologue_prefetch(tmp_path):
+    """ Test that prefetching can be enabled through Prologue """
+    lines = [random_str(10, 50) for _x in range(randint(1, 20))]
+    with open(tmp_path / "test.txt", "w") as fh: fh.write("\n".join(lines) + "\n")
+    with Prologue(prefetch=True) as pro:
+        pro.add_file(tmp_path / "test.txt")
+        assert list(pro.evaluate("test.txt")) == lines
+
 def test_prologue_messages(mocker):
     """ Test that debug messages are logged using 'print' or callback """
     pro        = Prologue()
@@ -241,8 +269,11 @@ def test_prologue_get_directive():
     # Test de-registering directives
     pro.deregister_directive(choice(line_opens))
     for tag in line_opens: assert not pro.has_directive(tag)
+    assert wrap_line not in pro.list_directives()
+    assert wrap_block in pro.list_directives()
     pro.deregister_directive(choice(block_opens + block_close))
     for tag in (block_opens + block_close): assert not pro.has_directive(tag)
+    assert wrap_block not in pro.list_directives()
     # Test deregistering directives again
     for tags in (line_opens, block_opens+block_close):
         use_tag = choice(tags)
@@ -257,10 +288,11 @@ def test_prologue_evaluate(mocker):
     mock_ctx_inst = []
     def create_context(*args, **kwargs):
         mock_ctx = MagicMock()
-        def fake_sub(line):
+        def fake_sub(line, lookup_append=None):
             print(f"Called fake_sub with {type(line)} {line}")
-            return line.encase("start sub " + str(line) + " end sub")
-        mock_ctx.substitute.side_effect = fake_sub
+            if lookup_append: lookup_append((line.file, line.number))
+            return "start sub " + str(line) + " end sub"
+        mock_ctx.substitute_into.side_effect = fake_sub
         mock_ctx_inst.append(mock_ctx)
         return mock_ctx
     mock_ctx_cls.side_effect = create_context
@@ -299,8 +331,14 @@ def test_prologue_evaluate(mocker):
     pro.evaluate_inner.assert_has_calls([call(
         l_file, mock_ctx_inst[0], callback=dummy_cb,
     )])
-    # Check calls to 'substitute'
-    mock_ctx_inst[0].substitute.assert_has_calls([call(x) for x in lines])
+    # Check calls to 'substitute_into'
+    mock_ctx_inst[0].substitute_into.assert_has_calls(
+        [call(x, lookup.append) for x in lines]
+    )
+    # Evaluate again without capturing a lookup
+    result = [x for x in pro.evaluate(l_file, callback=dummy_cb)]
+    assert result == [f"start sub {str(x)} end sub" for x in lines]
+    mock_ctx_inst[1].substitute_into.assert_has_calls([call(x) for x in lines])
 
 def test_prologue_resolve():
     """ Test resolving input line number and file path from output line number """
@@ -439,6 +477,40 @@ def test_prologue_evaluate_inner_plain(mocker):
     m_reg.resolve.assert_has_calls([call(r_file.filename)])
     assert ctx.stack == []
 
+def test_prologue_evaluate_inner_plain_cached(mocker):
+    """ Check that files without directives are passed through on later passes """
+    pro   = Prologue()
+    ctx   = Context(pro)
+    m_reg = mocker.patch.object(pro, "registry", autospec=True)
+    mocker.patch.object(RegistryFile, "__init__", lambda x: None)
+    m_con = mocker.patch.object(RegistryFile, "contents", new_callable=PropertyMock)
+    # Create a fake file
+    r_file      = RegistryFile()
+    r_file.path = Path(random_str(5, 10) + "." + random_str(5, 10))
+    m_reg.resolve.return_value = r_file
+    # Setup fake file contents
+    contents = [random_str(10, 50, spaces=True) for _x in range(randint(50, 100))]
+    m_con.return_value = contents
+    # The first pass parses the file, and records it as plain
+    assert list(pro.evaluate_inner(r_file.filename, ctx)) == contents
+    assert r_file in ctx.plain
+    assert r_file in ctx.fork().plain
+    # Files with comments, continuations, or directives are not recorded
+    for line in ("abc # comment", "abc \\", "#define A 1"):
+        other = Context(pro)
+        m_con.return_value = contents + [line, "def"]
+        list(pro.evaluate_inner(r_file.filename, other))
+        assert r_file not in other.plain
+    # Later passes yield the contents without parsing them
+    m_con.return_value = contents
+    m_tag = mocker.patch.object(pro, "_Prologue__re_tag")
+    m_flt = mocker.patch.object(pro, "_Prologue__re_floating")
+    assert list(pro.evaluate_inner(r_file.filename, ctx)) == contents
+    assert list(pro.evaluate_inner(r_file.filename, ctx.fork())) == contents
+    m_tag.match.assert_not_called()
+    m_flt.match.assert_not_called()
+    assert ctx.stack == []
+
 def test_prologue_evaluate_inner_line_span(mocker):
     """ Test use of line spanning using '\' to escape new line """
     pro   = Prologue()
@@ -838,3 +910,65 @@ def test_prologue_evaluate_inner_stack_corrupt(mocker):
         with pytest.raises(PrologueError) as excinfo:
             [x for x in pro.evaluate_inner(r_file.filename, ctx)]
         assert "File stack has been corrupted" in str(excinfo.value)
+
+def test_prologue_evaluate_inner_multi_char_delimiter(mocker):
+    """ Check that a multi-character delimiter is matched as a literal sequence """
+    # Choose a delimiter
+    delim = choice(("//", "@@", "$%", "!!"))
+    # Create preprocessor, context, etc
+    pro   = Prologue(delimiter=delim)
+    ctx   = Context(pro)
+    m_reg = mocker.patch.object(pro, "registry", autospec=True)
+    mocker.patch.object(RegistryFile, "__init__", lambda x: None)
+    m_con = mocker.patch.object(RegistryFile, "contents", new_callable=PropertyMock)
+    # Create a line directive
+    class LineDirx(LineDirective): pass
+    mocker.patch.object(LineDirx, "invoke",   autospec=True)
+    mocker.patch.object(LineDirx, "evaluate", autospec=True)
+    opening = [random_str(5, 10)]
+    pro.register_directive(DirectiveWrap(LineDirx, opening))
+    # Create a fake file
+    r_file      = RegistryFile()
+    r_file.path = Path(random_str(5, 10) + "." + random_str(5, 10))
+    m_reg.resolve.side_effect = [r_file]
+    # Only the full delimiter sequence should trigger the directive
+    argument = random_str(10, 20)
+    contents = [
+        f"{delim}{opening[0]} {argument}",
+        f"{delim[0]}{opening[0]} {argument}",
+    ]
+    m_con.return_value = [Line(x, r_file, i+1) for i, x in enumerate(contents)]
+    result = [x for x in pro.evaluate_inner(r_file.filename, ctx)]
+    # Checks
+    assert result == [contents[1]]
+    LineDirx.invoke.assert_called_once_with(ANY, opening[0].lower(), argument)
+
+def test_prologue_evaluate_inner_multi_char_comment(mocker):
+    """ Check that text before a floating directive may contain part of a comment """
+    # Choose a comment sequence
+    comment = choice(("//", "--", ";;"))
+    # Create preprocessor, context, etc
+    pro   = Prologue(comment=comment, delimiter="#")
+    ctx   = Context(pro)
+    m_reg = mocker.patch.object(pro, "registry", autospec=True)
+    mocker.patch.object(RegistryFile, "__init__", lambda x: None)
+    m_con = mocker.patch.object(RegistryFile, "contents", new_callable=PropertyMock)
+    # Create a line directive
+    class LineDirx(LineDirective): pass
+    mocker.patch.object(LineDirx, "invoke",   autospec=True)
+    mocker.patch.object(LineDirx, "evaluate", autospec=True)
+    opening = [random_str(5, 10)]
+    pro.register_directive(DirectiveWrap(LineDirx, opening))
+    # Create a fake file
+    r_file      = RegistryFile()
+    r_file.path = Path(random_str(5, 10) + "." + random_str(5, 10))
+    m_reg.resolve.side_effect = [r_file]
+    # The text before the directive contains a single comment character
+    prior    = random_str(5, 10) + comment[0] + random_str(5, 10)
+    argument = random_str(10, 20)
+    contents = [f"{prior} #{opening[0]} {argument} {comment} {random_str(5, 10)}"]
+    m_con.return_value = [Line(x, r_file, i+1) for i, x in enumerate(contents)]
+    result = [x for x in pro.evaluate_inner(r_file.filename, ctx)]
+    # Checks
+    assert result == [prior]
+    LineDirx.invoke.assert_called_once_with(ANY, opening[0].lower(), argument)
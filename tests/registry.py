@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+from concurrent.futures import Future
+from random import randint
 from unittest.mock import MagicMock
 
 import pytest
@@ -19,6 +22,8 @@ import pytest
 from prologue.common import PrologueError
 from prologue.registry import Registry, RegistryFile
 
+from .common import random_str
+
 def test_registry_add_bad_file(tmp_path):
     """ Add a bad file path into the registry """
     pro = MagicMock()
@@ -231,3 +236,123 @@ def test_registry_resolve_bad_folder(tmp_path):
     with pytest.raises(PrologueError) as excinfo:
         reg.resolve("some_name/some_file.txt")
     assert "Only a file is registered for path some_name" in str(excinfo.value)
+
+def test_registry_resolve_cached(tmp_path):
+    """ Check repeated resolutions return the same file until the registry changes """
+    pro    = MagicMock()
+    reg    = Registry(pro)
+    folder = tmp_path / "folder"
+    path_a = folder / "test_a.txt"
+    path_b = tmp_path / "test_b.txt"
+    folder.mkdir()
+    with open(path_a, "w") as fh: fh.write("dummy content")
+    with open(path_b, "w") as fh: fh.write("dummy content")
+    reg.add_folder(folder)
+    # Resolve the same file multiple times
+    r_file = reg.resolve("folder/test_a.txt")
+    assert reg.resolve("folder/test_a.txt") is r_file
+    assert reg.resolve(" folder/test_a.txt ") is r_file
+    # Unknown entries are not remembered
+    with pytest.raises(PrologueError) as excinfo:
+        reg.resolve("test_b.txt")
+    assert "No registry entry found for 'test_b.txt'" == str(excinfo.value)
+    # Adding a new entry makes it resolvable
+    reg.add_file(path_b)
+    assert reg.resolve("test_b.txt").path == path_b
+    assert reg.resolve("folder/test_a.txt").path == path_a
+
+def mock_executor(mocker):
+    """ Replace the prefetch executor with a mock that runs reads synchronously,
+    so that tests are deterministic.
+
+    Args:
+        mocker: The pytest-mock fixture
+
+    Returns: The mocked ThreadPoolExecutor class
+    """
+    def fake_submit(func):
+        future = Future()
+        future.set_result(func())
+        return future
+    m_exec = mocker.patch("prologue.registry.ThreadPoolExecutor")
+    m_exec.return_value.submit.side_effect = fake_submit
+    return m_exec
+
+def test_registry_prefetch(tmp_path, mocker):
+    """ Check that files are read in the background when prefetch is enabled """
+    m_exec = mock_executor(mocker)
+    # Create a registry with prefetching enabled
+    pro    = MagicMock()
+    reg    = Registry(pro, prefetch=True)
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    lines  = {}
+    for idx in range(10):
+        lines[f"file_{idx}.txt"] = [random_str(10, 50) for _x in range(randint(1, 20))]
+        with open(folder / f"file_{idx}.txt", "w") as fh:
+            fh.write("\n".join(lines[f"file_{idx}.txt"]) + "\n")
+    reg.add_folder(folder, search_for=".txt")
+    # Check a single executor was created, and every file was scheduled
+    m_exec.assert_called_once_with(max_workers=Registry.PREFETCH_WORKERS)
+    assert m_exec.return_value.submit.call_count == len(lines)
+    # Rewrite the files on disk, without changing their size or timestamp
+    for name, expected in lines.items():
+        stat = (folder / name).stat()
+        with open(folder / name, "w") as fh:
+            fh.write("\n".join(x.swapcase() for x in expected) + "\n")
+        os.utime(folder / name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    # Check that the prefetched contents are returned on first use
+    for name, expected in lines.items():
+        assert [str(x) for x in reg.resolve(name).contents] == expected
+    # Prefetched contents are only held until first use
+    for name, expected in lines.items():
+        assert [str(x) for x in reg.resolve(name).contents] == [
+            x.swapcase() for x in expected
+        ]
+    # Close the registry, shutting down the executor
+    reg.close()
+    m_exec.return_value.shutdown.assert_called_once_with(wait=True)
+
+def test_registry_prefetch_stale(tmp_path, mocker):
+    """ Check that prefetched contents are dropped if the file is modified """
+    m_exec = mock_executor(mocker)
+    # Create a file, and add it to a registry with prefetching enabled
+    pro  = MagicMock()
+    reg  = Registry(pro, prefetch=True)
+    path = tmp_path / "test.txt"
+    with open(path, "w") as fh: fh.write("original\n")
+    reg.add_file(path)
+    assert m_exec.return_value.submit.call_count == 1
+    # Modify the file on disk, moving its timestamp forward
+    stat = path.stat()
+    with open(path, "w") as fh: fh.write("modified\n")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    # Check that the file is read again
+    assert [str(x) for x in reg.resolve("test.txt").contents] == ["modified"]
+
+def test_registry_close(tmp_path, mocker):
+    """ Check that closing the registry stops the prefetch workers """
+    m_exec = mock_executor(mocker)
+    path   = tmp_path / "test.txt"
+    with open(path, "w") as fh: fh.write("hello\n")
+    # Closing without prefetching does nothing
+    with Registry(MagicMock()) as reg: reg.add_file(path)
+    assert not m_exec.called
+    # Use the registry as a context manager
+    with Registry(MagicMock(), prefetch=True) as reg:
+        reg.add_file(path)
+        m_exec.assert_called_once_with(max_workers=Registry.PREFETCH_WORKERS)
+        assert not m_exec.return_value.shutdown.called
+    m_exec.return_value.shutdown.assert_called_once_with(wait=True)
+    # Contents remain available after closing
+    assert [str(x) for x in reg.resolve("test.txt").contents] == ["hello"]
+    # Closing again does nothing, as the workers have already been stopped
+    reg.close()
+    assert m_exec.return_value.shutdown.call_count == 1
+    # Adding further files restarts the workers
+    with open(tmp_path / "other.txt", "w") as fh: fh.write("world\n")
+    reg.add_file(tmp_path / "other.txt")
+    assert m_exec.call_count == 2
+    assert [str(x) for x in reg.resolve("other.txt").contents] == ["world"]
+    reg.close()
+    assert m_exec.return_value.shutdown.call_count == 2
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from random import randint
+
 import pytest
 
 from prologue.common import PrologueError, Line
@@ -62,3 +64,39 @@ def test_reg_file_contents(tmp_path):
         assert line.number == (idx + 1)
         assert line.file   == r_file
         assert str(line)   == lines[idx].rstrip()
+
+def test_reg_file_contents_streamed(tmp_path):
+    """ Check that a file's contents are streamed line by line """
+    the_path = tmp_path / "test.txt"
+    lines    = [f"line {x}   " for x in range(100)]
+    with open(the_path, "w") as fh: fh.write("\n".join(lines) + "\n")
+    r_file   = RegistryFile(the_path)
+    contents = r_file.contents
+    # Check that the contents are provided lazily
+    first = next(contents)
+    assert str(first) == "line 0"
+    assert first.file is r_file
+    assert first.number == 1
+    # Check the remaining lines
+    for idx, line in enumerate(contents, start=2):
+        assert str(line) == lines[idx-1].rstrip()
+        assert line.number == idx
+    assert idx == len(lines)
+
+def test_reg_file_snippet(tmp_path):
+    """ Check that a snippet is cut from around the requested line """
+    real_path = tmp_path / "my_file.txt"
+    lines     = [f"dummy line {x}" for x in range(50)]
+    with open(real_path, "w") as fh: fh.write("\n".join(lines))
+    r_file = RegistryFile(real_path)
+    for _x in range(100):
+        line    = randint(1, len(lines))
+        before  = randint(0, 5)
+        after   = randint(0, 5)
+        first   = max(1, line - before)
+        last    = min(len(lines), line + after)
+        snippet = r_file.snippet(line, before=before, after=after)
+        assert snippet == [
+            "%4i %s %s" % (x, ">>" if x == line else "  ", lines[x-1])
+            for x in range(first, last + 1)
+        ]